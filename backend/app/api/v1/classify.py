@@ -15,6 +15,7 @@ from app.core.config import settings
 from app.core.database import get_db
 from app.core.model_loader import get_model
 from app.models.classification import ClassificationHistory
+from app.services.statistics import statistics_service
 from app.utils.image_preprocessing import preprocess_image_for_detection
 from app.utils.bin_mapping import map_class_to_bin, BinType
 
@@ -74,16 +75,24 @@ def classify_image_yolo(image: Image.Image) -> Dict:
     """
     start_time = time.time()
     
-    # Apply low-light preprocessing if enabled
+    original_width, original_height = image.width, image.height
+    
+    # Apply low-light preprocessing if enabled (dark images are enhanced
+    # at the model input size)
     preprocessing_metadata = {}
     if settings.ENABLE_LOW_LIGHT_MODE:
         image, preprocessing_metadata = preprocess_image_for_detection(
             image,
             enable_low_light_mode=True,
             low_light_method=settings.LOW_LIGHT_METHOD,
-            brightness_threshold=settings.LOW_LIGHT_BRIGHTNESS_THRESHOLD
+            brightness_threshold=settings.LOW_LIGHT_BRIGHTNESS_THRESHOLD,
+            target_size=(settings.IMAGE_SIZE, settings.IMAGE_SIZE)
         )
     
+    # Boxes are reported in original image coordinates
+    box_scale_x = original_width / image.width
+    box_scale_y = original_height / image.height
+    
     # Get YOLO model
     model = get_model()
     
@@ -116,6 +125,8 @@ def classify_image_yolo(image: Image.Image) -> Dict:
         for idx, box in enumerate(boxes):
             # Get box coordinates
             x1, y1, x2, y2 = box.xyxy[0].tolist()
+            x1, x2 = x1 * box_scale_x, x2 * box_scale_x
+            y1, y2 = y1 * box_scale_y, y2 * box_scale_y
             
             # Get confidence and class
             conf = float(box.conf[0])
@@ -158,8 +169,8 @@ def classify_image_yolo(image: Image.Image) -> Dict:
         "total_objects": len(detections),
         "processing_time": round(processing_time, 3),
         "image_size": {
-            "width": image.width,
-            "height": image.height
+            "width": original_width,
+            "height": original_height
         }
     }
     
@@ -236,6 +247,7 @@ async def classify_waste(
                     db.add(history)
                 
                 db.commit()
+                statistics_service.mark_data_changed()
                 logger.info(f" Saved {result['total_objects']} detections to database")
                 
             except Exception as db_error:
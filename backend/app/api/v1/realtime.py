@@ -11,35 +11,55 @@ import logging
 from PIL import Image
 import io
 import time
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, List, Optional, Set
 import json
 
 from app.core.config import settings
 from app.core.database import get_db
 from app.core.model_loader import get_model
 from app.models.classification import ClassificationHistory
+from app.services.statistics import statistics_service
 from app.utils.image_preprocessing import preprocess_image_for_detection
 from sqlalchemy.orm import Session
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-from app.utils.bin_mapping import map_class_to_bin
+from app.utils.bin_mapping import class_bin_types, map_class_to_bin
+from app.utils.detection_filters import (
+    FRAME_AREA,
+    PASSED,
+    check_constraints_batch,
+    constraint_tables,
+)
+
+
+def _wall_clock_ms() -> float:
+    return time.time() * 1000
 
 
 class DetectionTracker:
     """
     Tracks detections across frames for stability
     Uses IoU matching and temporal smoothing
+    
+    Per-track state lives in a preallocated slot pool (one array or list per
+    field, indexed by slot). Ending a track returns its slot to a free list,
+    so steady-state updates allocate nothing per track; dicts are only built
+    for the stable detections that are returned.
     """
     
+    # Class history window for the anti-flicker vote
+    CLASS_HISTORY_SIZE = 3
+    
     def __init__(
         self,
         smoothing_alpha: float = 0.6,
         min_confidence: float = 0.35,
         min_frames: int = 3,
         min_duration_ms: float = 500,
-        iou_threshold: float = 0.3
+        iou_threshold: float = 0.3,
+        max_tracks: int = 64
     ):
         """
         Args:
@@ -48,6 +68,7 @@ class DetectionTracker:
             min_frames: Minimum consecutive frames before reporting
             min_duration_ms: Minimum duration in ms before reporting
             iou_threshold: IoU threshold for matching detections
+            max_tracks: Initial slot pool size (grows if exceeded)
         """
         self.smoothing_alpha = smoothing_alpha
         self.min_confidence = min_confidence
@@ -55,11 +76,114 @@ class DetectionTracker:
         self.min_duration_ms = min_duration_ms
         self.iou_threshold = iou_threshold
         
-        # Track active objects
-        self.tracked_objects = {}  # {track_id: TrackedObject}
+        # Slot pool (structure of arrays)
+        self._capacity = 0
+        self._boxes = np.zeros((0, 4), dtype=np.int64)
+        self._confs = np.zeros(0, dtype=np.float64)
+        self._frame_counts = np.zeros(0, dtype=np.int64)
+        self._first_seen = np.zeros(0, dtype=np.float64)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._track_ids = np.zeros(0, dtype=np.int64)
+        self._hist = np.zeros((0, self.CLASS_HISTORY_SIZE), dtype=np.int16)  # class codes, ring buffer
+        self._hist_len = np.zeros(0, dtype=np.int8)
+        self._hist_pos = np.zeros(0, dtype=np.int8)
+        self._class_name: List[Optional[str]] = []
+        self._class_name_en: List[Optional[str]] = []
+        self._bin_type: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._grow(max_tracks)
+        
+        # Active slots in creation (= track id) order
+        self._active: List[int] = []
+        
+        # Class name <-> small int code for the history ring buffer
+        self._class_codes: Dict[str, int] = {}
+        self._code_names: List[str] = []
+        
         self.next_track_id = 0
         self.logged_ids: Set[int] = set() # Track IDs that have already been logged to DB
         
+        # Millisecond clock; tests swap in a fake to step time without sleeping
+        self._now_ms: Callable[[], float] = _wall_clock_ms
+    
+    def _grow(self, extra: int):
+        """Extend the slot pool by `extra` free slots"""
+        old = self._capacity
+        self._capacity = old + extra
+        pad = ((0, extra), (0, 0))
+        self._boxes = np.pad(self._boxes, pad)
+        self._hist = np.pad(self._hist, pad)
+        for name in ('_confs', '_frame_counts', '_first_seen', '_last_seen',
+                     '_track_ids', '_hist_len', '_hist_pos'):
+            setattr(self, name, np.pad(getattr(self, name), (0, extra)))
+        for field in (self._class_name, self._class_name_en, self._bin_type):
+            field.extend([None] * extra)
+        # Pop from the end -> lowest slot first
+        self._free.extend(range(self._capacity - 1, old - 1, -1))
+    
+    def _class_code(self, class_name: str) -> int:
+        code = self._class_codes.get(class_name)
+        if code is None:
+            code = len(self._code_names)
+            self._class_codes[class_name] = code
+            self._code_names.append(class_name)
+        return code
+    
+    def _push_history(self, slot: int, class_name: str):
+        """Append to the slot's class ring buffer (drops the oldest when full)"""
+        pos = self._hist_pos[slot]
+        self._hist[slot, pos] = self._class_code(class_name)
+        self._hist_pos[slot] = (pos + 1) % self.CLASS_HISTORY_SIZE
+        if self._hist_len[slot] < self.CLASS_HISTORY_SIZE:
+            self._hist_len[slot] += 1
+    
+    def _class_history(self, slot: int) -> List[str]:
+        """Class history of a slot, oldest first"""
+        n = int(self._hist_len[slot])
+        start = int(self._hist_pos[slot]) - n
+        return [self._code_names[self._hist[slot, (start + i) % self.CLASS_HISTORY_SIZE]] for i in range(n)]
+    
+    def _dominant_class(self, slot: int) -> Optional[str]:
+        """Class seen at least twice in the history window, if any"""
+        n = self._hist_len[slot]
+        if n < 2:
+            return None
+        h = self._hist[slot]
+        if h[0] == h[1] or (n > 2 and h[0] == h[2]):
+            return self._code_names[h[0]]
+        if n > 2 and h[1] == h[2]:
+            return self._code_names[h[1]]
+        return None
+    
+    def _release(self, slot: int):
+        self._class_name[slot] = self._class_name_en[slot] = self._bin_type[slot] = None
+        self._free.append(slot)
+    
+    @property
+    def num_tracks(self) -> int:
+        """Number of active tracks"""
+        return len(self._active)
+    
+    @property
+    def tracked_objects(self) -> Dict[int, Dict]:
+        """Snapshot of the active tracks as {track_id: state dict} (debug/tests)"""
+        objects = {}
+        for slot in self._active:
+            track_id = int(self._track_ids[slot])
+            objects[track_id] = {
+                'track_id': track_id,
+                'box': self._boxes[slot].tolist(),
+                'confidence': float(self._confs[slot]),
+                'class_name': self._class_name[slot],
+                'class_name_en': self._class_name_en[slot],
+                'class_history': self._class_history(slot),
+                'bin_type': self._bin_type[slot],
+                'frame_count': int(self._frame_counts[slot]),
+                'first_seen': float(self._first_seen[slot]),
+                'last_seen': float(self._last_seen[slot])
+            }
+        return objects
+        
     def calculate_iou(self, box1: List[int], box2: List[int]) -> float:
         """Calculate Intersection over Union between two boxes"""
         x1_min, y1_min, x1_max, y1_max = box1
@@ -83,6 +207,22 @@ class DetectionTracker:
         
         return inter_area / union_area if union_area > 0 else 0.0
     
+    def calculate_iou_batch(self, box: List[int], boxes: np.ndarray) -> np.ndarray:
+        """IoU between one box and an (N, 4) array of boxes"""
+        x_min, y_min, x_max, y_max = box
+        inter_w = np.minimum(boxes[:, 2], x_max) - np.maximum(boxes[:, 0], x_min)
+        inter_h = np.minimum(boxes[:, 3], y_max) - np.maximum(boxes[:, 1], y_min)
+        inter_area = inter_w * inter_h
+        inter_area[(inter_w < 0) | (inter_h < 0)] = 0
+        
+        box_area = (x_max - x_min) * (y_max - y_min)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        union_area = areas + box_area - inter_area
+        
+        iou = np.zeros(len(boxes), dtype=np.float64)
+        np.divide(inter_area, union_area, out=iou, where=union_area > 0)
+        return iou
+    
     def smooth_box(self, current_box: List[int], previous_box: List[int]) -> List[int]:
         """Apply exponential moving average to box coordinates"""
         alpha = self.smoothing_alpha
@@ -95,14 +235,15 @@ class DetectionTracker:
         """
         Update tracker with new detections with advanced safeguards
         """
-        current_time = time.time() * 1000
+        from app.utils.bin_mapping import VN_TO_EN_CLASS_NAMES
+        
+        current_time = self._now_ms()
         
         # Match detections to existing tracks
-        matched_tracks = set()
         unmatched_detections = []
+        active = np.array(self._active, dtype=np.intp)
         
         for detection in raw_detections:
-            from app.utils.bin_mapping import VN_TO_EN_CLASS_NAMES
             class_en = VN_TO_EN_CLASS_NAMES.get(detection['class_name'], detection['class_name'].lower())
             
             # --- HEURISTIC: Class-aware sensitivity ---
@@ -110,19 +251,15 @@ class DetectionTracker:
             if class_en in ["biological", "paper"]:
                 effective_min_conf = min(effective_min_conf, 0.20)
             
-            best_iou = 0
-            best_track_id = None
-            
-            # Find best matching track
-            for track_id, tracked_obj in self.tracked_objects.items():
-                iou = self.calculate_iou(detection['box'], tracked_obj['box'])
-                if iou > best_iou and iou >= self.iou_threshold:
-                    best_iou = iou
-                    best_track_id = track_id
+            # Find best matching track (first one wins ties, as in track order)
+            slot = None
+            if len(active):
+                ious = self.calculate_iou_batch(detection['box'], self._boxes[active])
+                best = int(np.argmax(ious))
+                if ious[best] > 0 and ious[best] >= self.iou_threshold:
+                    slot = int(active[best])
             
-            if best_track_id is not None:
-                tracked_obj = self.tracked_objects[best_track_id]
-                
+            if slot is not None:
                 # --- HEURISTIC: Hysteresis (Keep-alive threshold) ---
                 # Once an object is tracked, we can be more lenient to keep it (0.8x threshold)
                 keep_alive_threshold = effective_min_conf * 0.8 * 100
@@ -131,14 +268,14 @@ class DetectionTracker:
 
                 # --- HEURISTIC: Size Stability Check ---
                 curr_box = detection['box']
-                prev_box = tracked_obj['box']
+                prev_box = self._boxes[slot].tolist()
                 curr_area = (curr_box[2] - curr_box[0]) * (curr_box[3] - curr_box[1])
                 prev_area = (prev_box[2] - prev_box[0]) * (prev_box[3] - prev_box[1])
                 
                 if prev_area > 0:
                     area_growth = curr_area / prev_area
                     if area_growth > 2.5: 
-                        if tracked_obj['class_name_en'] == "battery" and detection['confidence'] < 80:
+                        if self._class_name_en[slot] == "battery" and detection['confidence'] < 80:
                             unmatched_detections.append(detection)
                             continue
 
@@ -148,28 +285,26 @@ class DetectionTracker:
                 dynamic_alpha = self.smoothing_alpha * (0.5 + 0.5 * trust_factor)
                 
                 # Manual smoothing with dynamic alpha
-                tracked_obj['box'] = [
+                self._boxes[slot] = [
                     int(dynamic_alpha * curr + (1 - dynamic_alpha) * prev)
-                    for curr, prev in zip(detection['box'], tracked_obj['box'])
+                    for curr, prev in zip(curr_box, prev_box)
                 ]
                 
                 # --- HEURISTIC: Class Consistency (Anti-Flicker) ---
                 # Track class history to prevent jumping between types
-                tracked_obj['class_history'].append(detection['class_name'])
-                if len(tracked_obj['class_history']) > 3: # Shorter history for better responsiveness
-                    tracked_obj['class_history'].pop(0)
+                # (short window for better responsiveness)
+                self._push_history(slot, detection['class_name'])
                 
                 # Only update the primary class if the new class is dominant in history
-                most_common_class = max(set(tracked_obj['class_history']), key=tracked_obj['class_history'].count)
-                if tracked_obj['class_history'].count(most_common_class) >= 2:
-                    tracked_obj['class_name'] = most_common_class
-                    tracked_obj['class_name_en'] = VN_TO_EN_CLASS_NAMES.get(most_common_class, most_common_class.lower())
-                    tracked_obj['bin_type'] = map_class_to_bin(most_common_class).value
-
-                tracked_obj['confidence'] = detection['confidence']
-                tracked_obj['frame_count'] += 1
-                tracked_obj['last_seen'] = current_time
-                matched_tracks.add(best_track_id)
+                most_common_class = self._dominant_class(slot)
+                if most_common_class is not None:
+                    self._class_name[slot] = most_common_class
+                    self._class_name_en[slot] = VN_TO_EN_CLASS_NAMES.get(most_common_class, most_common_class.lower())
+                    self._bin_type[slot] = map_class_to_bin(most_common_class).value
+
+                self._confs[slot] = detection['confidence']
+                self._frame_counts[slot] += 1
+                self._last_seen[slot] = current_time
             else:
                 # New detection - needs full threshold to start a track
                 if detection['confidence'] >= effective_min_conf * 100:
@@ -177,42 +312,48 @@ class DetectionTracker:
         
         # Create new tracks
         for detection in unmatched_detections:
-            track_id = self.next_track_id
+            if not self._free:
+                self._grow(self._capacity)
+            slot = self._free.pop()
+            self._track_ids[slot] = self.next_track_id
             self.next_track_id += 1
-            self.tracked_objects[track_id] = {
-                'track_id': track_id,
-                'box': detection['box'],
-                'confidence': detection['confidence'],
-                'class_name': detection['class_name'],
-                'class_name_en': detection['class_name_en'],
-                'class_history': [detection['class_name']],
-                'bin_type': detection['bin_type'],
-                'frame_count': 1,
-                'first_seen': current_time,
-                'last_seen': current_time
-            }
+            self._boxes[slot] = detection['box']
+            self._confs[slot] = detection['confidence']
+            self._class_name[slot] = detection['class_name']
+            self._class_name_en[slot] = detection['class_name_en']
+            self._bin_type[slot] = detection['bin_type']
+            self._hist_len[slot] = 0
+            self._hist_pos[slot] = 0
+            self._push_history(slot, detection['class_name'])
+            self._frame_counts[slot] = 1
+            self._first_seen[slot] = current_time
+            self._last_seen[slot] = current_time
+            self._active.append(slot)
         
         # Remove stale tracks
         stale_threshold = current_time - 500
-        stale_tracks = [tid for tid, obj in self.tracked_objects.items() if obj['last_seen'] < stale_threshold]
-        for tid in stale_tracks:
-            # If a track becomes stale, it's no longer active, so remove it from logged_ids
-            if tid in self.logged_ids:
-                self.logged_ids.remove(tid)
-            del self.tracked_objects[tid]
+        if self._active:
+            active = np.array(self._active, dtype=np.intp)
+            stale = self._last_seen[active] < stale_threshold
+            if stale.any():
+                for slot in active[stale].tolist():
+                    # If a track becomes stale, it's no longer active, so remove it from logged_ids
+                    self.logged_ids.discard(int(self._track_ids[slot]))
+                    self._release(slot)
+                self._active = active[~stale].tolist()
         
         # Return stable detections
         stable_detections = []
-        for track_id, tracked_obj in self.tracked_objects.items():
-            duration = current_time - tracked_obj['first_seen']
+        for slot in self._active:
+            duration = current_time - float(self._first_seen[slot])
             
             effective_min_frames = self.min_frames
             effective_min_duration = self.min_duration_ms
             
-            x1, y1, x2, y2 = tracked_obj['box']
+            x1, y1, x2, y2 = box = self._boxes[slot].tolist()
             area_ratio = ((x2 - x1) * (y2 - y1)) / (640 * 480)
             
-            if tracked_obj['class_name_en'] in ["biological", "paper"]:
+            if self._class_name_en[slot] in ["biological", "paper"]:
                 if area_ratio > 0.10: 
                     effective_min_frames = 2  
                     effective_min_duration = 300 
@@ -220,16 +361,17 @@ class DetectionTracker:
                     effective_min_frames = 4 
                     effective_min_duration = 700
                 
-            if (tracked_obj['frame_count'] >= effective_min_frames and 
+            frame_count = int(self._frame_counts[slot])
+            if (frame_count >= effective_min_frames and 
                 duration >= effective_min_duration):
                 stable_detections.append({
-                    'box': tracked_obj['box'],
-                    'confidence': tracked_obj['confidence'],
-                    'class_name': tracked_obj['class_name'],
-                    'class_name_en': tracked_obj['class_name_en'],
-                    'bin_type': tracked_obj['bin_type'],
-                    'detection_id': track_id,
-                    'frame_count': tracked_obj['frame_count'],
+                    'box': box,
+                    'confidence': float(self._confs[slot]),
+                    'class_name': self._class_name[slot],
+                    'class_name_en': self._class_name_en[slot],
+                    'bin_type': self._bin_type[slot],
+                    'detection_id': int(self._track_ids[slot]),
+                    'frame_count': frame_count,
                     'duration_ms': round(duration, 0)
                 })
         
@@ -284,72 +426,33 @@ def process_frame_yolo(model, image: Image.Image) -> Dict:
     
     if result.boxes is not None and len(result.boxes) > 0:
         boxes = result.boxes
+        class_names_vn = tuple(result.names.values())
+        class_names_en, *tables = constraint_tables(class_names_vn)
+        bin_types = class_bin_types(class_names_vn)
         
-        from app.utils.bin_mapping import VN_TO_EN_CLASS_NAMES
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float64)
+        confs = boxes.conf.cpu().numpy().astype(np.float64)
+        class_ids = boxes.cls.cpu().numpy().astype(np.int64)
         
-        for idx, box in enumerate(boxes):
-            conf = float(box.conf[0])
-            cls = int(box.cls[0])
-            
-            if cls < 0 or cls >= len(result.names):
-                continue
-            
-            class_name_vn = result.names[cls]
-            class_name_en = VN_TO_EN_CLASS_NAMES.get(class_name_vn, class_name_vn.lower())
-            
-            # --- HEURISTIC: Class-specific Threshold Filtering ---
-            # Get the effective threshold for this class
-            class_threshold = settings.CLASS_SPECIFIC_CONF.get(class_name_en, settings.CONF_THRESHOLD)
-            
-            if conf < class_threshold:
-                continue
-                
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            
-            # --- HEURISTIC: Size Filtering ---
-            # Avoid tiny background noise misidentified as paper/textile
-            width = x2 - x1
-            height = y2 - y1
-            area_ratio = (width * height) / (640 * 480)
-            aspect_ratio = width / height if height > 0 else 1.0
-            
-            # 1. Minimum Size Filtering (Noisy background)
-            if class_name_en in ["paper", "cardboard", "textile"]:
-                if area_ratio < 0.02: # Ignore objects smaller than 2% of frame
-                    continue
-            elif area_ratio < 0.01: # General noise filter (1%)
-                continue
-            
-            # 2. Maximum Size Filtering (Oversized Hallucinations)
-            # Detections like "Battery" should not cover half the screen
-            constraints = settings.CLASS_SIZE_CONSTRAINTS.get(class_name_en)
-            if constraints:
-                max_area = constraints.get("max_area", 1.0)
-                # If box is too large for this class
-                if area_ratio > max_area:
-                    # HEURISTIC: If box is oversized, it MUST have extremely high confidence (e.g., 0.85)
-                    # to be accepted, otherwise it's likely catching background textures.
-                    if conf < 0.85:
-                        continue
-                
-                # 3. Aspect Ratio Check (Localization consistency)
-                min_aspect = constraints.get("min_aspect")
-                max_aspect = constraints.get("max_aspect")
-                if min_aspect and aspect_ratio < min_aspect:
-                    if conf < 0.80: # Reject if also uncertain
-                        continue
-                if max_aspect and aspect_ratio > max_aspect:
-                    if conf < 0.80:
-                        continue
-
-            bin_type_enum = map_class_to_bin(class_name_vn)
-            bin_type = bin_type_enum.value
+        # --- HEURISTICS: class threshold, min/max size, aspect ratio ---
+        # Baseline prediction uses conf=0.15; CLASS_SPECIFIC_CONF restores
+        # precision, tiny boxes are background noise (2% for paper/cardboard/
+        # textile, 1% otherwise), and oversized or oddly shaped boxes
+        # (CLASS_SIZE_CONSTRAINTS) need 0.85 / 0.80 confidence to survive.
+        codes = check_constraints_batch(xyxy, confs, class_ids, *tables, FRAME_AREA)
+        
+        for idx in np.flatnonzero(codes == PASSED).tolist():
+            cls = int(class_ids[idx])
+            conf = float(confs[idx])
+            x1, y1, x2, y2 = xyxy[idx].tolist()
+            class_name_vn = class_names_vn[cls]
+            bin_type = bin_types[cls]
             
             detection = {
                 "box": [int(x1), int(y1), int(x2), int(y2)],
                 "confidence": round(conf * 100, 1),
                 "class_name": class_name_vn,
-                "class_name_en": class_name_en,
+                "class_name_en": class_names_en[cls],
                 "bin_type": bin_type,
                 "detection_id": idx
             }
@@ -413,6 +516,7 @@ class ConnectionManager:
                         )
                         db.add(history)
                         db.commit()
+                        statistics_service.mark_data_changed()
                         tracker.logged_ids.add(track_id)
                         logger.info(f" [Stats] Recorded stable real-time detection: {primary['class_name']} (Track {track_id})")
                     except Exception as e:
@@ -429,6 +533,48 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+def decode_text_frame(raw_data: str, frame_count: int) -> bytes:
+    """
+    Decode a text WebSocket frame (base64, data URL or JSON-wrapped) to image bytes
+    
+    Binary frames carry the JPEG bytes directly and skip this step.
+    """
+    processed_data = raw_data
+
+    # 1. Handle JSON (either {"frame": "..."} or just a quoted string "\"abc...\"")
+    try:
+        parsed = json.loads(raw_data)
+        if isinstance(parsed, dict):
+            # Try common keys
+            for key in ["frame", "image", "data", "img"]:
+                if key in parsed:
+                    processed_data = parsed[key]
+                    break
+            else:
+                # Use first string value if only one exists
+                string_vals = [v for v in parsed.values() if isinstance(v, str)]
+                if len(string_vals) == 1:
+                    processed_data = string_vals[0]
+        elif isinstance(parsed, str):
+            processed_data = parsed
+    except json.JSONDecodeError:
+        # Not JSON, keep as raw string
+        pass
+
+    # 2. Remove Data URL prefix if present (e.g., "data:image/jpeg;base64,")
+    if isinstance(processed_data, str) and ',' in processed_data:
+        processed_data = processed_data.split(',')[1]
+
+    # 3. Decode Base64
+    try:
+        img_bytes = base64.b64decode(processed_data)
+    except Exception as b64_err:
+        logger.error(f"❌ Base64 decode failed for frame {frame_count}: {b64_err}")
+        raise ValueError(f"Invalid base64 data: {b64_err}")
+
+    return img_bytes
+
+
 @router.websocket("/ws/realtime-detect")
 async def websocket_realtime_detect(websocket: WebSocket, db: Session = Depends(get_db)):
     """
@@ -461,50 +607,28 @@ async def websocket_realtime_detect(websocket: WebSocket, db: Session = Depends(
         logger.info("🚀 YOLO model ready for realtime")
 
         while True:
-            # Receive frame from client
-            raw_data = await websocket.receive_text()
+            # Receive frame from client: binary (raw JPEG bytes, preferred)
+            # or text (base64 / data URL / JSON)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            img_bytes = message.get("bytes")
+            raw_data = message.get("text")
             frame_count += 1
 
-            if not raw_data:
+            if not img_bytes and not raw_data:
                 continue
 
             # Debug first few frames
             if frame_count <= 3 or frame_count % 100 == 0:
-                logger.info(f"📥 Frame {frame_count}: len={len(raw_data)}, sample={raw_data[:50]}...")
+                if img_bytes is not None:
+                    logger.info(f"📥 Frame {frame_count}: binary, len={len(img_bytes)}")
+                else:
+                    logger.info(f"📥 Frame {frame_count}: len={len(raw_data)}, sample={raw_data[:50]}...")
 
             try:
-                processed_data = raw_data
-                
-                # 1. Handle JSON (either {"frame": "..."} or just a quoted string "\"abc...\"")
-                try:
-                    parsed = json.loads(raw_data)
-                    if isinstance(parsed, dict):
-                        # Try common keys
-                        for key in ["frame", "image", "data", "img"]:
-                            if key in parsed:
-                                processed_data = parsed[key]
-                                break
-                        else:
-                            # Use first string value if only one exists
-                            string_vals = [v for v in parsed.values() if isinstance(v, str)]
-                            if len(string_vals) == 1:
-                                processed_data = string_vals[0]
-                    elif isinstance(parsed, str):
-                        processed_data = parsed
-                except json.JSONDecodeError:
-                    # Not JSON, keep as raw string
-                    pass
-
-                # 2. Remove Data URL prefix if present (e.g., "data:image/jpeg;base64,")
-                if isinstance(processed_data, str) and ',' in processed_data:
-                    processed_data = processed_data.split(',')[1]
-
-                # 3. Decode Base64
-                try:
-                    img_bytes = base64.b64decode(processed_data)
-                except Exception as b64_err:
-                    logger.error(f"❌ Base64 decode failed for frame {frame_count}: {b64_err}")
-                    raise ValueError(f"Invalid base64 data: {b64_err}")
+                if img_bytes is None:
+                    img_bytes = decode_text_frame(raw_data, frame_count)
 
                 if not img_bytes:
                     raise ValueError("Received empty image bytes")
@@ -549,7 +673,7 @@ async def websocket_realtime_detect(websocket: WebSocket, db: Session = Depends(
                         "fps": round(fps, 2),
                         "image_size": result["image_size"],
                         "raw_detections": len(raw_detections),
-                        "tracked_objects": len(tracker.tracked_objects)
+                        "tracked_objects": tracker.num_tracks
                     }
                 }
                 await manager.broadcast_detection(response, db, tracker)
@@ -56,10 +56,8 @@ async def get_summary_stats(
         Summary statistics
     """
     try:
-        total = statistics_service.get_total_classifications(db, days)
-        recyclable = statistics_service.get_recyclable_count(db, days)
-        accuracy = statistics_service.get_accuracy_rate(db, days)
-        co2_saved = statistics_service.get_co2_saved(db, days)
+        total, recyclable, accuracy = statistics_service.get_summary_counts(db, days)
+        co2_saved = statistics_service.co2_from_recyclable_count(recyclable)
         
         return {
             "success": True,
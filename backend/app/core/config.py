@@ -89,6 +89,10 @@ class Settings(BaseSettings):
     # Device Settings (GPU acceleration if available)
     DEVICE: str = "cpu"  # Options: "cpu", "cuda", "mps" (Mac GPU)
     
+    # TensorRT engines exported by scripts/switch_model.py next to MODEL_PATH
+    # (<name>.engine = INT8, <name>_fp16.engine = FP16 fallback), CUDA only
+    USE_TENSORRT_ENGINE: bool = True
+    
     # Low-Light Mode Settings
     ENABLE_LOW_LIGHT_MODE: bool = True
     LOW_LIGHT_BRIGHTNESS_THRESHOLD: float = 80.0
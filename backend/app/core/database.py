@@ -74,6 +74,12 @@ def init_db():
     Call this on application startup
     """
     Base.metadata.create_all(bind=engine)
+    
+    # create_all() skips tables that already exist, so add any indexes
+    # introduced after the table was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def check_db_connection() -> bool:
@@ -11,6 +11,7 @@ import logging
 
 import os
 from app.core.config import settings
+from app.utils.bin_mapping import intern_class_names
 
 logger = logging.getLogger(__name__)
 
@@ -89,13 +90,16 @@ class ModelLoader:
             
             logger.info(f"Loading YOLO model from: {model_path}")
             
-            # Load YOLO model
-            model = YOLO(str(model_path))
+            # Load YOLO model (TensorRT engine if one was exported)
+            model = self._load_engine(model_path) or YOLO(str(model_path))
             
             # Verify model loaded correctly
             if model is None:
                 raise RuntimeError("Failed to load YOLO model")
             
+            # Class names are looked up in the bin mapping tables per detection
+            intern_class_names(model.names)
+            
             self._model = model
             
             logger.info("=" * 60)
@@ -116,6 +120,41 @@ class ModelLoader:
             logger.error(f"Error loading YOLO model: {str(e)}")
             raise
     
+    def _load_engine(self, model_path: Path) -> Optional[YOLO]:
+        """
+        Load a TensorRT engine exported next to the .pt weights
+        
+        Prefers the INT8 engine, then the FP16 one. Only used on CUDA
+        devices; any load failure falls back to the PyTorch weights.
+        
+        Args:
+            model_path: Path to the .pt weights
+            
+        Returns:
+            YOLO model backed by the engine, or None
+        """
+        if not settings.USE_TENSORRT_ENGINE or not settings.DEVICE.startswith("cuda"):
+            return None
+        
+        candidates = [
+            model_path.with_suffix(".engine"),
+            model_path.with_name(f"{model_path.stem}_fp16.engine"),
+        ]
+        for engine_path in candidates:
+            if not engine_path.exists():
+                continue
+            try:
+                model = YOLO(str(engine_path), task="detect")
+                # Accessing names builds the TensorRT backend, so a broken
+                # engine fails here rather than on the first request
+                _ = model.names
+                logger.info(f"Loading TensorRT engine from: {engine_path}")
+                return model
+            except Exception as e:
+                logger.warning(f"  Could not load TensorRT engine {engine_path}: {str(e)}")
+        
+        return None
+    
     @property
     def model(self) -> YOLO:
         """Get the loaded model"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -16,6 +16,13 @@ class ClassificationHistory(Base):
     user_id = Column(String(100), index=True)  # "anonymous" or user identifier
     created_at = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now())
     
+    # Statistics queries filter on created_at and group by bin_type / class_name_vn
+    __table_args__ = (
+        Index("ix_ch_created_at", "created_at"),
+        Index("ix_ch_bin_created", "bin_type", "created_at"),
+        Index("ix_ch_classvn_created", "class_name_vn", "created_at"),
+    )
+    
     # Optional: Box coordinates if needed later
     # box_x1 = Column(Integer, nullable=True)
     # box_y1 = Column(Integer, nullable=True)
@@ -23,6 +23,7 @@ class ResultSmoother:
         """
         self.window_size = window_size
         self.stability_threshold = stability_threshold
+        self._min_required = max(3, int(window_size * stability_threshold))
         
         # History buffers
         self.class_history = deque(maxlen=window_size)
@@ -32,6 +33,7 @@ class ResultSmoother:
         # State
         self.stable_result = None
         self.frames_stable = 0
+        self._is_stable = False  # Outcome of the last get_stable_result()
         
     def add_prediction(
         self,
@@ -60,6 +62,7 @@ class ResultSmoother:
         """
         if len(self.class_history) < 3:
             # Not enough data yet
+            self._is_stable = False
             return None
         
         # Find most common class using Counter
@@ -104,10 +107,12 @@ class ResultSmoother:
             
             self.stable_result = stable_result
             stable_result['frames_stable'] = self.frames_stable
+            self._is_stable = True
             
             return stable_result
         
         # Not stable yet
+        self._is_stable = False
         return None
     
     def get_latest_prediction(self) -> Optional[Dict[str, Any]]:
@@ -152,8 +157,7 @@ class ResultSmoother:
         Returns:
             (current_frames, min_required_frames)
         """
-        min_required = max(3, int(self.window_size * self.stability_threshold))
-        return (len(self.class_history), min_required)
+        return (len(self.class_history), self._min_required)
     
     def reset(self):
         """Reset all history"""
@@ -162,10 +166,14 @@ class ResultSmoother:
         self.bin_history.clear()
         self.stable_result = None
         self.frames_stable = 0
+        self._is_stable = False
     
     def is_building_confidence(self) -> bool:
-        """Check if still building confidence"""
-        return len(self.class_history) > 0 and self.get_stable_result() is None
+        """
+        Check if still building confidence
+        Reflects the last get_stable_result() call (does not recompute)
+        """
+        return bool(self.class_history) and not self._is_stable
 
 
 def test_smoother():
@@ -4,18 +4,40 @@ Statistics Service
 Handles statistical analysis of classification history
 """
 
-from sqlalchemy import func, extract
+from sqlalchemy import func, extract, case, Date, literal, select, union_all
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Dict, List
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
 from collections import Counter
+import threading
+import time
 
 from app.models.classification import ClassificationHistory
 
 
+# Estimate: 0.5kg per item * 0.5kg CO2 saved per kg = 0.25kg CO2 per item
+CO2_KG_PER_RECYCLABLE_ITEM = 0.25
+
+# Dashboard cache: {period: (expires_at, data_version, stats)}
+DASHBOARD_CACHE_TTL_SECONDS = 30.0
+_dashboard_cache: Dict[str, Tuple[float, int, Dict]] = {}
+_dashboard_cache_lock = threading.Lock()
+_data_version = 0
+
+
 class StatisticsService:
     """Service for generating statistics"""
     
+    @staticmethod
+    def mark_data_changed() -> None:
+        """
+        Invalidate cached dashboard stats
+        Call after inserting classification history rows
+        """
+        global _data_version
+        with _dashboard_cache_lock:
+            _data_version += 1
+    
     @staticmethod
     def get_total_classifications(db: Session, days: int = None) -> int:
         """Get total number of classifications"""
@@ -60,9 +82,43 @@ class StatisticsService:
         Average waste weight: ~0.5kg per item
         """
         recyclable_count = StatisticsService.get_recyclable_count(db, days)
-        # Estimate: 0.5kg per item * 0.5kg CO2 saved per kg = 0.25kg CO2 per item
-        co2_saved = recyclable_count * 0.25
-        return round(co2_saved, 1)
+        return StatisticsService.co2_from_recyclable_count(recyclable_count)
+    
+    @staticmethod
+    def co2_from_recyclable_count(recyclable_count: int) -> float:
+        """Convert an already-fetched recyclable count to kg CO2 saved"""
+        return round(recyclable_count * CO2_KG_PER_RECYCLABLE_ITEM, 1)
+    
+    @staticmethod
+    def _summary(db: Session, start_date: datetime = None) -> Tuple[int, int, float]:
+        """
+        Total, recyclable count and average confidence in one scan
+        
+        Returns:
+            (total, recyclable, accuracy)
+        """
+        query = db.query(
+            func.count(ClassificationHistory.id),
+            func.sum(case((ClassificationHistory.bin_type == "recyclable", 1), else_=0)),
+            func.avg(ClassificationHistory.confidence)
+        )
+        
+        if start_date is not None:
+            query = query.filter(ClassificationHistory.created_at >= start_date)
+        
+        total, recyclable, accuracy = query.one()
+        return total or 0, int(recyclable or 0), float(accuracy) if accuracy else 0.0
+    
+    @staticmethod
+    def get_summary_counts(db: Session, days: int = None) -> Tuple[int, int, float]:
+        """
+        Get total, recyclable count and accuracy rate with a single query
+        
+        Returns:
+            (total, recyclable, accuracy)
+        """
+        start_date = datetime.now() - timedelta(days=days) if days else None
+        return StatisticsService._summary(db, start_date)
     
     @staticmethod
     def get_trend_data(db: Session, days: int = 7) -> List[Dict]:
@@ -70,29 +126,44 @@ class StatisticsService:
         Get classification trend for the last N days
         Returns: [{"date": "T2", "count": 45}, ...]
         """
-        start_date = datetime.now() - timedelta(days=days)
+        # One row per calendar day (oldest first), including days without
+        # classifications, so the frontend gets a dense series
+        first_day = date.today() - timedelta(days=days - 1)
+        day_rows = [
+            select(literal(first_day + timedelta(days=offset), Date).label('day'))
+            for offset in range(days)
+        ]
+        calendar = (union_all(*day_rows) if len(day_rows) > 1 else day_rows[0]).cte('calendar')
         
-        # Group by date
-        results = db.query(
-            func.date(ClassificationHistory.created_at).label('date'),
+        # Group by date on an index-backed created_at range scan
+        # (typed as Date so rows come back as date objects)
+        daily_counts = db.query(
+            func.date(ClassificationHistory.created_at, type_=Date).label('day'),
             func.count(ClassificationHistory.id).label('count')
         ).filter(
-            ClassificationHistory.created_at >= start_date
+            ClassificationHistory.created_at >= datetime.combine(first_day, datetime.min.time())
         ).group_by(
             func.date(ClassificationHistory.created_at)
-        ).order_by('date').all()
+        ).subquery()
+        
+        results = db.query(
+            calendar.c.day.label('date'),
+            func.coalesce(daily_counts.c.count, 0).label('count')
+        ).outerjoin(
+            daily_counts, daily_counts.c.day == calendar.c.day
+        ).order_by(calendar.c.day).all()
         
         # Format for frontend
         weekdays = ["T2", "T3", "T4", "T5", "T6", "T7", "CN"]
-        trend_data = []
-        
-        for result in results:
-            date_obj = datetime.strptime(str(result.date), "%Y-%m-%d")
-            weekday = weekdays[date_obj.weekday()]
-            trend_data.append({
-                "date": weekday,
+        trend_data = [
+            {
+                "date": weekdays[
+                    (date.fromisoformat(result.date) if isinstance(result.date, str) else result.date).weekday()
+                ],
                 "count": result.count
-            })
+            }
+            for result in results
+        ]
         
         return trend_data
     
@@ -158,9 +229,28 @@ class StatisticsService:
         """
         Get all statistics for dashboard
         
+        Results are cached per period for DASHBOARD_CACHE_TTL_SECONDS, or
+        until mark_data_changed() is called. Treat the result as read-only.
+        
         Args:
             period: "today", "week", "month"
         """
+        now = time.monotonic()
+        with _dashboard_cache_lock:
+            version = _data_version
+            cached = _dashboard_cache.get(period)
+        if cached and cached[0] > now and cached[1] == version:
+            return cached[2]
+        
+        stats = StatisticsService._compute_dashboard_stats(db, period)
+        
+        with _dashboard_cache_lock:
+            _dashboard_cache[period] = (now + DASHBOARD_CACHE_TTL_SECONDS, version, stats)
+        return stats
+    
+    @staticmethod
+    def _compute_dashboard_stats(db: Session, period: str) -> Dict:
+        """Query all dashboard statistics (uncached)"""
         days_map = {
             "today": 1,
             "week": 7,
@@ -169,19 +259,60 @@ class StatisticsService:
         days = days_map.get(period, 7)
         
         # Get previous period for comparison
-        prev_days = days * 2
+        now = datetime.now()
+        current_start = now - timedelta(days=days)
+        prev_start = now - timedelta(days=days * 2)
+        
+        # Single pass over both periods: bucket each row as current/previous
+        # and aggregate with conditional sums instead of one SELECT per metric
+        bucket = case(
+            (ClassificationHistory.created_at >= current_start, "current"),
+            else_="previous"
+        ).label("bucket")
+        results = db.query(
+            bucket,
+            func.count(ClassificationHistory.id).label("total"),
+            func.sum(
+                case((ClassificationHistory.bin_type == "recyclable", 1), else_=0)
+            ).label("recyclable"),
+            func.sum(ClassificationHistory.confidence).label("confidence_sum"),
+            func.count(ClassificationHistory.confidence).label("confidence_count")
+        ).filter(
+            ClassificationHistory.created_at >= prev_start
+        ).group_by(bucket).all()
+        
+        periods = {
+            "current": {"total": 0, "recyclable": 0, "confidence_sum": 0.0, "confidence_count": 0},
+            "previous": {"total": 0, "recyclable": 0, "confidence_sum": 0.0, "confidence_count": 0},
+        }
+        for result in results:
+            periods[result.bucket] = {
+                "total": result.total or 0,
+                "recyclable": int(result.recyclable or 0),
+                "confidence_sum": float(result.confidence_sum or 0.0),
+                "confidence_count": result.confidence_count or 0,
+            }
+        current, previous = periods["current"], periods["previous"]
         
         # Current period stats
-        total_current = StatisticsService.get_total_classifications(db, days)
-        recyclable_current = StatisticsService.get_recyclable_count(db, days)
-        accuracy_current = StatisticsService.get_accuracy_rate(db, days)
-        co2_current = StatisticsService.get_co2_saved(db, days)
+        total_current = current["total"]
+        recyclable_current = current["recyclable"]
+        accuracy_current = (
+            current["confidence_sum"] / current["confidence_count"]
+            if current["confidence_count"] else 0.0
+        )
+        co2_current = StatisticsService.co2_from_recyclable_count(recyclable_current)
         
         # Previous period stats (for comparison)
-        total_prev = StatisticsService.get_total_classifications(db, prev_days) - total_current
-        recyclable_prev = StatisticsService.get_recyclable_count(db, prev_days) - recyclable_current
-        accuracy_prev = StatisticsService.get_accuracy_rate(db, prev_days)
-        co2_prev = recyclable_prev * 0.25
+        # Accuracy baseline is averaged over both periods, as before
+        total_prev = previous["total"]
+        recyclable_prev = previous["recyclable"]
+        combined_count = current["confidence_count"] + previous["confidence_count"]
+        accuracy_prev = (
+            (current["confidence_sum"] + previous["confidence_sum"]) / combined_count
+            if combined_count else 0.0
+        )
+        co2_prev = recyclable_prev * CO2_KG_PER_RECYCLABLE_ITEM
         
         # Calculate percentage changes
         def calc_change(current, previous):
@@ -5,8 +5,12 @@ This module handles the mapping of predicted waste classes to recycling bins
 with advanced strategies for composite materials and edge cases.
 """
 
+import sys
 from typing import Dict, List, Tuple, Optional
 from enum import Enum
+from functools import lru_cache
+
+import numpy as np
 
 
 class BinType(str, Enum):
@@ -67,6 +71,43 @@ EN_TO_VN_CLASS_NAMES: Dict[str, str] = {
     "trash": "Rac thai",
 }
 
+# All class-name strings are interned so that names from the model (interned
+# by intern_class_names at load time) match table keys by identity. Intern
+# any new class-name table or source the same way.
+BIN_MAPPING = {sys.intern(name): bin_type for name, bin_type in BIN_MAPPING.items()}
+VN_TO_EN_CLASS_NAMES = {sys.intern(vn): sys.intern(en) for vn, en in VN_TO_EN_CLASS_NAMES.items()}
+EN_TO_VN_CLASS_NAMES = {sys.intern(en): sys.intern(vn) for en, vn in EN_TO_VN_CLASS_NAMES.items()}
+
+
+# ============================================================================
+# INTEGER CLASS / BIN IDS (array-indexed fast path)
+# ============================================================================
+
+# Stable class IDs, alphabetical (same order as settings.CLASS_NAMES)
+CLASS_NAMES: List[str] = sorted(BIN_MAPPING)
+CLASS_NAME_TO_ID: Dict[str, int] = {name: i for i, name in enumerate(CLASS_NAMES)}
+
+# Bin IDs index into BIN_TYPES
+BIN_TYPES: List[BinType] = list(BinType)
+BIN_MAPPING_ARR: np.ndarray = np.array(
+    [BIN_TYPES.index(BIN_MAPPING[name]) for name in CLASS_NAMES],
+    dtype=np.int8,
+)
+GENERAL_IDX: int = BIN_TYPES.index(BinType.GENERAL)
+
+# English and Vietnamese class names -> bin ID (English wins on clashes)
+CLASS_TO_BIN_IDX: Dict[str, int] = {
+    vn: int(BIN_MAPPING_ARR[CLASS_NAME_TO_ID[en]]) if en in CLASS_NAME_TO_ID else GENERAL_IDX
+    for vn, en in VN_TO_EN_CLASS_NAMES.items()
+}
+CLASS_TO_BIN_IDX.update({name: int(BIN_MAPPING_ARR[i]) for i, name in enumerate(CLASS_NAMES)})
+
+# English and Vietnamese class names -> BinType in one table (English wins on clashes)
+_UNIFIED_MAP: Dict[str, BinType] = {
+    vn: BIN_MAPPING.get(en, BinType.GENERAL) for vn, en in VN_TO_EN_CLASS_NAMES.items()
+}
+_UNIFIED_MAP.update(BIN_MAPPING)
+
 
 # ============================================================================
 # VIETNAMESE BIN NAMES
@@ -144,6 +185,13 @@ COMPOSITE_PATTERNS = {
 }
 
 
+# O(1) membership sets for the pattern class lists
+_COMPOSITE_CLASS_SETS: Dict[str, frozenset] = {
+    name: frozenset(map(sys.intern, pattern["possible_classes"]))
+    for name, pattern in COMPOSITE_PATTERNS.items()
+}
+
+
 # ============================================================================
 # ADVANCED MAPPING FUNCTIONS
 # ============================================================================
@@ -159,17 +207,40 @@ def map_class_to_bin(predicted_class: str) -> BinType:
     Returns:
         BinType enum value
     """
-    # First, try direct English lookup
-    if predicted_class in BIN_MAPPING:
-        return BIN_MAPPING[predicted_class]
+    # Single lookup in the merged English + Vietnamese table
+    return _UNIFIED_MAP.get(predicted_class, BinType.GENERAL)
+
+
+@lru_cache(maxsize=8)
+def class_bin_types(class_names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Bin type value for each model class, in class-id order
+    
+    Memoized per model: detections then index this tuple by class id instead
+    of mapping every box. The mapping tables are module constants; call
+    class_bin_types.cache_clear() if they are ever modified at runtime.
+    
+    Args:
+        class_names: Model class names in id order (Vietnamese or English)
+        
+    Returns:
+        Tuple of bin type strings ('recyclable', 'general', 'hazardous', ...)
+    """
+    return tuple(map_class_to_bin(name).value for name in class_names)
+
+
+def intern_class_names(model_names: Dict[int, str]) -> None:
+    """
+    Intern a model's class names in place
     
-    # If not found, try Vietnamese to English conversion
-    if predicted_class in VN_TO_EN_CLASS_NAMES:
-        english_class = VN_TO_EN_CLASS_NAMES[predicted_class]
-        return BIN_MAPPING.get(english_class, BinType.GENERAL)
+    Call once after loading a model so the names it reports are the same
+    string objects as the mapping-table keys.
     
-    # Default to general if not found
-    return BinType.GENERAL
+    Args:
+        model_names: model.names dict ({class_index: class_name})
+    """
+    for index, name in model_names.items():
+        model_names[index] = sys.intern(name)
 
 
 def aggregate_bin_scores(
@@ -184,19 +255,15 @@ def aggregate_bin_scores(
     Returns:
         Tuple of (bin_type, aggregated_confidence)
     """
-    bin_scores: Dict[BinType, float] = {
-        BinType.RECYCLABLE: 0.0,
-        BinType.GENERAL: 0.0,
-        BinType.HAZARDOUS: 0.0,
-        BinType.ORGANIC: 0.0,
-    }
+    # Plain list indexed by bin ID; for top-k sized inputs this beats both
+    # a BinType-keyed dict and a NumPy bincount (array setup dominates)
+    bin_scores = [0.0] * len(BIN_TYPES)
     
     for class_name, probability in top_predictions:
-        bin_type = map_class_to_bin(class_name)
-        bin_scores[bin_type] += probability
+        bin_scores[CLASS_TO_BIN_IDX.get(class_name, GENERAL_IDX)] += probability
     
-    best_bin = max(bin_scores.items(), key=lambda x: x[1])
-    return best_bin[0], best_bin[1]
+    best_idx = max(range(len(bin_scores)), key=bin_scores.__getitem__)
+    return BIN_TYPES[best_idx], bin_scores[best_idx]
 
 
 def check_composite_material(
@@ -217,47 +284,38 @@ def check_composite_material(
     if len(top_predictions) < 2:
         return None
     
-    top_classes = [cls for cls, _ in top_predictions]
-    
     for material_name, pattern in COMPOSITE_PATTERNS.items():
-        # Count how many of the pattern classes are in top predictions
-        matching_classes = [
-            cls for cls in top_classes 
-            if cls in pattern["possible_classes"]
-        ]
+        possible_classes = _COMPOSITE_CLASS_SETS[material_name]
         
-        if len(matching_classes) < pattern["min_classes"]:
-            continue
+        # Single pass: match count, combined confidence and the two
+        # highest matching probabilities (no list until a pattern matches)
+        matching_count = 0
+        combined_confidence = 0.0
+        top1 = top2 = 0.0
+        for cls, prob in top_predictions:
+            if cls in possible_classes:
+                matching_count += 1
+                combined_confidence += prob
+                if prob > top1:
+                    top2, top1 = top1, prob
+                elif prob > top2:
+                    top2 = prob
         
-        # Calculate combined confidence for matching classes
-        combined_confidence = sum(
-            prob for cls, prob in top_predictions
-            if cls in pattern["possible_classes"]
-        )
+        # Count how many of the pattern classes are in top predictions
+        if matching_count < pattern["min_classes"]:
+            continue
         
         # Check combined confidence threshold
         if combined_confidence < pattern["combined_confidence_threshold"]:
             continue
         
-       
         if "min_secondary_confidence" in pattern:
-            # Get confidences of matching classes
-            matching_probs = [
-                prob for cls, prob in top_predictions
-                if cls in pattern["possible_classes"]
-            ]
-            
-            # Sort to get highest and second highest
-            matching_probs.sort(reverse=True)
+            # Only 1 matching class → Not a composite
+            if matching_count < 2:
+                continue
             
-            # If we have at least 2 matching classes
-            if len(matching_probs) >= 2:
-                # Check if second class has meaningful confidence
-                if matching_probs[1] < pattern["min_secondary_confidence"]:
-                    # Secondary class too weak → Not a composite
-                    continue
-            else:
-                # Only 1 matching class → Not a composite
+            # Secondary class too weak → Not a composite
+            if top2 < pattern["min_secondary_confidence"]:
                 continue
         
         # All checks passed → It's a composite!
@@ -269,14 +327,22 @@ def check_composite_material(
             "bin_type": pattern["final_bin"],
             "special_instruction": pattern["special_instruction"],
             "combined_confidence": combined_confidence,
-            "matching_classes": matching_classes,
+            "matching_classes": [
+                cls for cls, _ in top_predictions if cls in possible_classes
+            ],
         }
     
     return None
 
 
+@lru_cache(maxsize=None)
 def get_bin_info(bin_type: BinType) -> Dict:
-    """Get complete information about a bin type"""
+    """
+    Get complete information about a bin type
+    
+    Memoized per bin type: the returned dict is shared, callers must not
+    mutate it (copy via dict.update / ** as smart_map does).
+    """
     return {
         "bin_type": bin_type.value,
         "bin_type_vn": BIN_NAMES_VN[bin_type],
@@ -286,6 +352,22 @@ def get_bin_info(bin_type: BinType) -> Dict:
     }
 
 
+# Classes per bin, built once from BIN_MAPPING
+_CLASSES_BY_BIN: Dict[BinType, List[str]] = {bin_type: [] for bin_type in BinType}
+for _cls, _bin_type in BIN_MAPPING.items():
+    _CLASSES_BY_BIN[_bin_type].append(_cls)
+del _cls, _bin_type
+
+# get_all_bins_info() output depends only on module constants
+_ALL_BINS_INFO: List[Dict] = [
+    {
+        **get_bin_info(bin_type),
+        "recyclable_classes": _CLASSES_BY_BIN[bin_type]
+    }
+    for bin_type in BinType
+]
+
+
 def smart_map(
     predicted_class: str,
     confidence: float,
@@ -338,17 +420,12 @@ def smart_map(
 
 
 def get_all_bins_info() -> List[Dict]:
-    """Get information about all bin types"""
-    return [
-        {
-            **get_bin_info(bin_type),
-            "recyclable_classes": [
-                cls for cls, bt in BIN_MAPPING.items() 
-                if bt == bin_type
-            ]
-        }
-        for bin_type in BinType
-    ]
+    """
+    Get information about all bin types
+    
+    Returns a shared, precomputed list: callers must not mutate it.
+    """
+    return _ALL_BINS_INFO
 
 
 def validate_class_name(class_name: str) -> bool:
@@ -0,0 +1,136 @@
+"""
+Detection Filters
+Class-specific confidence, size and aspect-ratio heuristics for raw YOLO boxes
+"""
+
+import numpy as np
+from functools import lru_cache
+from typing import Tuple
+
+from app.core.config import settings
+from app.utils.bin_mapping import VN_TO_EN_CLASS_NAMES
+from app.utils.jit import njit
+
+
+# Frame size the area heuristics were tuned on
+FRAME_AREA = 640.0 * 480.0
+
+# Flat textures that get misread from background noise need a larger box
+MIN_AREA_LARGE = 0.02
+MIN_AREA_DEFAULT = 0.01
+LARGE_MIN_AREA_CLASSES = ("paper", "cardboard", "textile")
+
+# Oversized / odd-shaped boxes are only kept when the model is very sure
+OVERSIZE_MIN_CONF = 0.85
+ASPECT_MIN_CONF = 0.80
+
+# Per-box result codes of check_constraints_batch
+PASSED = 0
+REJECT_CLASS_ID = 1
+REJECT_CONFIDENCE = 2
+REJECT_MIN_AREA = 3
+REJECT_MAX_AREA = 4
+REJECT_MIN_ASPECT = 5
+REJECT_MAX_ASPECT = 6
+
+REJECT_REASONS = (
+    "Passed",
+    "Unknown class id",
+    "Below class threshold",
+    "Below min area",
+    "Exceeded max area",
+    "Failed min aspect",
+    "Failed max aspect",
+)
+
+
+@njit(
+    "int8[:](float64[:, :], float64[:], int64[:], float64[:], float64[:], "
+    "float64[:], float64[:], float64[:], float64)"
+)
+def check_constraints_batch(
+    boxes: np.ndarray,
+    confs: np.ndarray,
+    class_ids: np.ndarray,
+    class_thresholds: np.ndarray,
+    min_areas: np.ndarray,
+    max_areas: np.ndarray,
+    min_aspects: np.ndarray,
+    max_aspects: np.ndarray,
+    frame_area: float
+) -> np.ndarray:
+    """
+    Apply the per-class heuristics to every box in one pass
+
+    Args:
+        boxes: (N, 4) xyxy boxes in pixels
+        confs: (N,) confidences (0-1)
+        class_ids: (N,) model class ids
+        class_thresholds, min_areas, max_areas, min_aspects, max_aspects:
+            Per-class-id tables from constraint_tables (0 = no aspect limit)
+        frame_area: Reference frame area for the area ratios
+
+    Returns:
+        (N,) int8 result codes, PASSED (0) for boxes to keep
+    """
+    n = boxes.shape[0]
+    num_classes = class_thresholds.shape[0]
+    codes = np.empty(n, dtype=np.int8)
+    for i in range(n):
+        c = class_ids[i]
+        conf = confs[i]
+        if c < 0 or c >= num_classes:
+            codes[i] = REJECT_CLASS_ID
+            continue
+        if conf < class_thresholds[c]:
+            codes[i] = REJECT_CONFIDENCE
+            continue
+
+        width = boxes[i, 2] - boxes[i, 0]
+        height = boxes[i, 3] - boxes[i, 1]
+        area_ratio = (width * height) / frame_area
+        aspect_ratio = width / height if height > 0 else 1.0
+
+        if area_ratio < min_areas[c]:
+            codes[i] = REJECT_MIN_AREA
+        elif area_ratio > max_areas[c] and conf < OVERSIZE_MIN_CONF:
+            codes[i] = REJECT_MAX_AREA
+        elif min_aspects[c] > 0 and aspect_ratio < min_aspects[c] and conf < ASPECT_MIN_CONF:
+            codes[i] = REJECT_MIN_ASPECT
+        elif max_aspects[c] > 0 and aspect_ratio > max_aspects[c] and conf < ASPECT_MIN_CONF:
+            codes[i] = REJECT_MAX_ASPECT
+        else:
+            codes[i] = PASSED
+    return codes
+
+
+@lru_cache(maxsize=8)
+def constraint_tables(class_names: Tuple[str, ...]) -> Tuple:
+    """
+    Build the per-class-id tables for check_constraints_batch
+
+    Args:
+        class_names: Model class names in id order (Vietnamese or English)
+
+    Returns:
+        (class_names_en, class_thresholds, min_areas, max_areas,
+        min_aspects, max_aspects); the arrays are shared, do not modify
+    """
+    class_names_en = tuple(VN_TO_EN_CLASS_NAMES.get(name, name.lower()) for name in class_names)
+    num_classes = len(class_names_en)
+    class_thresholds = np.empty(num_classes, dtype=np.float64)
+    min_areas = np.empty(num_classes, dtype=np.float64)
+    max_areas = np.full(num_classes, np.inf, dtype=np.float64)
+    min_aspects = np.zeros(num_classes, dtype=np.float64)
+    max_aspects = np.zeros(num_classes, dtype=np.float64)
+
+    for i, name_en in enumerate(class_names_en):
+        class_thresholds[i] = settings.CLASS_SPECIFIC_CONF.get(name_en, settings.CONF_THRESHOLD)
+        min_areas[i] = MIN_AREA_LARGE if name_en in LARGE_MIN_AREA_CLASSES else MIN_AREA_DEFAULT
+        constraints = settings.CLASS_SIZE_CONSTRAINTS.get(name_en)
+        if constraints:
+            max_areas[i] = constraints.get("max_area", 1.0)
+            min_aspects[i] = constraints.get("min_aspect") or 0.0
+            max_aspects[i] = constraints.get("max_aspect") or 0.0
+
+    return class_names_en, class_thresholds, min_areas, max_areas, min_aspects, max_aspects
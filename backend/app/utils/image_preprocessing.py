@@ -7,9 +7,52 @@ import cv2
 import numpy as np
 from PIL import Image
 import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.jit import NUMBA_AVAILABLE, njit
 
 logger = logging.getLogger(__name__)
 
+# CLAHE objects keep internal scratch buffers, so they are reused per thread
+# rather than shared: {(clip_limit, tile_grid_size): cv2.CLAHE}
+_clahe_local = threading.local()
+
+
+def _get_clahe(clip_limit: float, tile_grid_size: Tuple[int, int]) -> "cv2.CLAHE":
+    """Get a cached CLAHE instance for the current thread"""
+    cache: Dict[Tuple[float, Tuple[int, int]], "cv2.CLAHE"] = getattr(_clahe_local, "cache", None)
+    if cache is None:
+        cache = _clahe_local.cache = {}
+    key = (clip_limit, tile_grid_size)
+    clahe = cache.get(key)
+    if clahe is None:
+        clahe = cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+    return clahe
+
+
+# Pixel stride used when sampling brightness
+BRIGHTNESS_SAMPLE_STRIDE = 8
+
+# ITU-R BT.601 luma weights for RGB input (as used by cv2.COLOR_RGB2GRAY)
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+# np.asarray(PIL image) and np.frombuffer give read-only arrays, which need
+# their own specialization
+@njit(["float64(uint8[:, :, :])", "float64(Array(uint8, 3, 'A', readonly=True))"], fastmath=True)
+def _mean_luma_u8(img: np.ndarray) -> float:
+    """Mean BT.601 luma of a (possibly strided) HxWxC uint8 view in one pass"""
+    h, w = img.shape[0], img.shape[1]
+    total = 0.0
+    for i in range(h):
+        row = 0.0
+        for j in range(w):
+            row += 0.299 * img[i, j, 0] + 0.587 * img[i, j, 1] + 0.114 * img[i, j, 2]
+        total += row
+    return total / (h * w)
+
 
 def calculate_brightness(image_np: np.ndarray) -> float:
     """
@@ -21,17 +64,36 @@ def calculate_brightness(image_np: np.ndarray) -> float:
     Returns:
         Average brightness (0-255)
     """
-    # Convert to grayscale
-    if len(image_np.shape) == 3:
-        gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
+    # A stride-8 subsample is plenty for a mean (~64x less memory traffic)
+    small = image_np[::BRIGHTNESS_SAMPLE_STRIDE, ::BRIGHTNESS_SAMPLE_STRIDE]
+    
+    # Numba kernel: single fused pass, no temporary gray array
+    if (NUMBA_AVAILABLE and small.ndim == 3 and small.dtype == np.uint8
+            and small.shape[2] >= 3 and small.size):
+        return _mean_luma_u8(small)
+    
+    # Luminance directly from the channels (same weights as RGB2GRAY)
+    if small.ndim == 3:
+        gray = small[..., :3] @ _LUMA_WEIGHTS
     else:
-        gray = image_np
+        gray = small
     
     # Calculate mean brightness
     brightness = np.mean(gray)
     return float(brightness)
 
 
+def _calculate_brightness_pil(image: Image.Image) -> float:
+    """
+    Average brightness of a PIL image without a full-size numpy copy
+    
+    Box-reduces the image by BRIGHTNESS_SAMPLE_STRIDE and converts the
+    thumbnail to "L" (same BT.601 luma weights as calculate_brightness).
+    """
+    thumb = image.reduce(BRIGHTNESS_SAMPLE_STRIDE).convert("L")
+    return float(np.asarray(thumb).mean())
+
+
 def is_low_light(image_np: np.ndarray, threshold: float = 80.0) -> bool:
     """
     Detect if image is taken in low-light conditions
@@ -47,6 +109,31 @@ def is_low_light(image_np: np.ndarray, threshold: float = 80.0) -> bool:
     return brightness < threshold
 
 
+# Color space CLAHE runs in: "YCrCb" (cheaper conversion) or "LAB"
+CLAHE_COLORSPACE = "YCrCb"
+
+_CLAHE_CONVERSIONS = {
+    "YCrCb": (cv2.COLOR_RGB2YCrCb, cv2.COLOR_YCrCb2RGB),
+    "LAB": (cv2.COLOR_RGB2LAB, cv2.COLOR_LAB2RGB),
+}
+
+
+# Run CLAHE through cv2.UMat (OpenCL T-API, e.g. on an iGPU) when an OpenCL
+# device is present and OpenCV has OpenCL enabled
+USE_OPENCL = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+
+def _enhance_brightness_adaptive_umat(image_np: np.ndarray) -> np.ndarray:
+    """CLAHE on the luma channel via cv2.UMat (see enhance_brightness_adaptive)"""
+    to_colorspace, to_rgb = _CLAHE_CONVERSIONS[CLAHE_COLORSPACE]
+    
+    converted = cv2.cvtColor(cv2.UMat(image_np), to_colorspace)
+    luma = _get_clahe(3.0, (8, 8)).apply(cv2.extractChannel(converted, 0))
+    converted = cv2.insertChannel(luma, converted, 0)
+    
+    return cv2.cvtColor(converted, to_rgb).get()
+
+
 def enhance_brightness_adaptive(image_np: np.ndarray) -> np.ndarray:
     """
     Adaptively enhance image brightness using CLAHE
@@ -58,25 +145,70 @@ def enhance_brightness_adaptive(image_np: np.ndarray) -> np.ndarray:
     Returns:
         Enhanced image (RGB)
     """
-    # Convert RGB to LAB color space
-    lab = cv2.cvtColor(image_np, cv2.COLOR_RGB2LAB)
+    if USE_OPENCL:
+        return _enhance_brightness_adaptive_umat(image_np)
     
-    # Split LAB channels
-    l, a, b = cv2.split(lab)
+    to_colorspace, to_rgb = _CLAHE_CONVERSIONS[CLAHE_COLORSPACE]
     
-    # Apply CLAHE to L channel
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-    l_enhanced = clahe.apply(l)
+    # Convert RGB to a luma/chroma color space
+    converted = cv2.cvtColor(image_np, to_colorspace)
     
-    # Merge channels
-    lab_enhanced = cv2.merge([l_enhanced, a, b])
+    # Apply CLAHE to the luma channel (channel 0 is Y or L) and write it
+    # back in place; the chroma channels are never copied out
+    converted[..., 0] = _get_clahe(3.0, (8, 8)).apply(converted[..., 0])
     
     # Convert back to RGB
-    enhanced = cv2.cvtColor(lab_enhanced, cv2.COLOR_LAB2RGB)
+    enhanced = cv2.cvtColor(converted, to_rgb)
     
     return enhanced
 
 
+# Brightness at or above which a dark image gets global histogram
+# equalization instead of CLAHE (mildly dark, roughly uniform contrast)
+GLOBAL_EQ_MIN_BRIGHTNESS = 60.0
+
+
+def enhance_brightness_global_eq(image_np: np.ndarray) -> np.ndarray:
+    """
+    Enhance image brightness with global histogram equalization
+    
+    Cheaper than CLAHE (one histogram + LUT instead of per-tile work) and
+    good enough for mildly dark frames.
+    
+    Args:
+        image_np: Input image (RGB)
+        
+    Returns:
+        Enhanced image (RGB)
+    """
+    to_colorspace, to_rgb = _CLAHE_CONVERSIONS[CLAHE_COLORSPACE]
+    
+    converted = cv2.cvtColor(image_np, to_colorspace)
+    converted[..., 0] = cv2.equalizeHist(converted[..., 0])
+    
+    return cv2.cvtColor(converted, to_rgb)
+
+
+@lru_cache(maxsize=32)
+def _gamma_lut(gamma: float) -> np.ndarray:
+    """
+    Build (and memoize) the 256-entry uint8 gamma lookup table
+    
+    Args:
+        gamma: Gamma value, rounded by the caller to keep the cache small
+        
+    Returns:
+        Read-only uint8 LUT
+    """
+    table = (np.power(np.arange(256) / 255.0, 1.0 / gamma) * 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+# Gamma tables for the values used in this module, built at import
+_GAMMA_LUTS: Dict[float, np.ndarray] = {g: _gamma_lut(g) for g in (1.2, 1.5, 2.0)}
+
+
 def enhance_brightness_gamma(image_np: np.ndarray, gamma: float = 1.5) -> np.ndarray:
     """
     Enhance brightness using gamma correction
@@ -88,9 +220,10 @@ def enhance_brightness_gamma(image_np: np.ndarray, gamma: float = 1.5) -> np.nda
     Returns:
         Enhanced image (RGB)
     """
-    # Build lookup table
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype("uint8")
+    # Lookup table (prebuilt for common gammas, memoized for the rest)
+    table = _GAMMA_LUTS.get(gamma)
+    if table is None:
+        table = _gamma_lut(round(gamma, 3))
     
     # Apply gamma correction
     enhanced = cv2.LUT(image_np, table)
@@ -102,16 +235,20 @@ def auto_enhance_low_light(
     image_np: np.ndarray,
     method: str = "clahe",
     brightness_threshold: float = 80.0,
-    force: bool = False
+    force: bool = False,
+    original_brightness: Optional[float] = None
 ) -> tuple[np.ndarray, bool, dict]:
     """
     Automatically enhance image if it's taken in low-light conditions
     
     Args:
         image_np: Input image (RGB numpy array)
-        method: Enhancement method ("clahe", "gamma", or "both")
+        method: Enhancement method ("clahe", "gamma", or "both"). With
+            "clahe", images at or above GLOBAL_EQ_MIN_BRIGHTNESS get global
+            histogram equalization instead (metadata method "global_eq")
         brightness_threshold: Threshold to detect low-light
         force: Force enhancement regardless of brightness
+        original_brightness: Already-measured brightness (skips the probe)
         
     Returns:
         Tuple of (enhanced_image, was_enhanced, metadata)
@@ -119,12 +256,13 @@ def auto_enhance_low_light(
     metadata = {}
     
     # Calculate original brightness
-    original_brightness = calculate_brightness(image_np)
+    if original_brightness is None:
+        original_brightness = calculate_brightness(image_np)
     metadata["original_brightness"] = round(original_brightness, 2)
     metadata["brightness_threshold"] = brightness_threshold
     
-    # Check if enhancement is needed
-    needs_enhancement = force or is_low_light(image_np, brightness_threshold)
+    # Check if enhancement is needed (reuse the brightness computed above)
+    needs_enhancement = force or original_brightness < brightness_threshold
     metadata["is_low_light"] = needs_enhancement
     
     if not needs_enhancement:
@@ -135,7 +273,11 @@ def auto_enhance_low_light(
     # Apply enhancement
     logger.info(f" Low-light detected (brightness: {original_brightness:.1f}), applying enhancement...")
     
-    if method == "clahe":
+    if method == "clahe" and GLOBAL_EQ_MIN_BRIGHTNESS <= original_brightness < brightness_threshold:
+        # Only mildly dark: global equalization is enough
+        method = "global_eq"
+        enhanced = enhance_brightness_global_eq(image_np)
+    elif method == "clahe":
         enhanced = enhance_brightness_adaptive(image_np)
     elif method == "gamma":
         enhanced = enhance_brightness_gamma(image_np, gamma=1.5)
@@ -159,11 +301,62 @@ def auto_enhance_low_light(
     return enhanced, True, metadata
 
 
+def _bright_image_metadata(original_brightness: float, brightness_threshold: float) -> dict:
+    """Low-light metadata for an image that needs no enhancement"""
+    return {
+        "original_brightness": round(original_brightness, 2),
+        "brightness_threshold": brightness_threshold,
+        "is_low_light": False,
+        "enhanced": False,
+        "method": None,
+    }
+
+
+def _enhance_dark_image(
+    image: Image.Image,
+    original_brightness: float,
+    low_light_method: str,
+    brightness_threshold: float,
+    target_size: Optional[Tuple[int, int]],
+    metadata: dict
+) -> tuple[Image.Image, dict]:
+    """Resize (optionally) and enhance an image already probed as dark"""
+    # Downscale to the detector input size first; enhancement cost is
+    # linear in pixel count
+    if target_size is not None:
+        scale = min(target_size[0] / image.width, target_size[1] / image.height)
+        if scale < 1.0:
+            resized_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(resized_size, Image.BILINEAR)
+            metadata["preprocessing_applied"].append("resize")
+    
+    # Apply low-light enhancement
+    image_np = np.array(image)
+    enhanced_np, was_enhanced, enhance_meta = auto_enhance_low_light(
+        image_np,
+        method=low_light_method,
+        brightness_threshold=brightness_threshold,
+        original_brightness=original_brightness
+    )
+    metadata["low_light"] = enhance_meta
+    
+    if not was_enhanced:
+        return image, metadata
+    
+    metadata["preprocessing_applied"].append("low_light_enhancement")
+    
+    # Convert back to PIL
+    processed_image = Image.fromarray(enhanced_np)
+    
+    return processed_image, metadata
+
+
 def preprocess_image_for_detection(
     image: Image.Image,
     enable_low_light_mode: bool = True,
     low_light_method: str = "clahe",
-    brightness_threshold: float = 80.0
+    brightness_threshold: float = 80.0,
+    target_size: Optional[Tuple[int, int]] = None
 ) -> tuple[Image.Image, dict]:
     """
     Preprocess PIL Image for YOLO detection
@@ -173,32 +366,82 @@ def preprocess_image_for_detection(
         enable_low_light_mode: Enable automatic low-light enhancement
         low_light_method: Enhancement method
         brightness_threshold: Brightness threshold
+        target_size: Detector input size (width, height). When set, dark
+            images are downscaled to fit it (keeping aspect ratio) before
+            enhancement, so CLAHE runs on the pixels the model will see.
+            The returned image may then be smaller than the input.
         
     Returns:
         Tuple of (processed_image, metadata)
     """
-    # Convert PIL to numpy
-    image_np = np.array(image)
-    
     metadata = {"preprocessing_applied": []}
     
-    # Apply low-light enhancement if enabled
-    if enable_low_light_mode:
-        enhanced_np, was_enhanced, enhance_meta = auto_enhance_low_light(
-            image_np,
-            method=low_light_method,
-            brightness_threshold=brightness_threshold
-        )
-        
-        if was_enhanced:
-            image_np = enhanced_np
-            metadata["preprocessing_applied"].append("low_light_enhancement")
-        
-        metadata["low_light"] = enhance_meta
-    else:
+    if not enable_low_light_mode:
         metadata["low_light"] = {"enabled": False}
+        return image, metadata
     
-    # Convert back to PIL
-    processed_image = Image.fromarray(image_np)
+    # Probe brightness on a thumbnail; bright images (the common case) are
+    # returned as-is without a PIL -> numpy -> PIL round trip
+    original_brightness = _calculate_brightness_pil(image)
     
-    return processed_image, metadata
+    if original_brightness >= brightness_threshold:
+        metadata["low_light"] = _bright_image_metadata(original_brightness, brightness_threshold)
+        return image, metadata
+    
+    return _enhance_dark_image(
+        image, original_brightness, low_light_method,
+        brightness_threshold, target_size, metadata
+    )
+
+
+def preprocess_batch(
+    images: List[Image.Image],
+    enable_low_light_mode: bool = True,
+    low_light_method: str = "clahe",
+    brightness_threshold: float = 80.0,
+    target_size: Optional[Tuple[int, int]] = None
+) -> List[tuple[Image.Image, dict]]:
+    """
+    Preprocess a burst of PIL Images (multi-upload or video frames)
+    
+    Brightness is probed on thumbnails and thresholded in one vectorized
+    comparison; only the dark images go through enhancement. Bright images
+    are returned as the original objects (no copy).
+    
+    Args:
+        images: PIL Images (sizes may differ)
+        enable_low_light_mode: Enable automatic low-light enhancement
+        low_light_method: Enhancement method
+        brightness_threshold: Brightness threshold
+        target_size: Detector input size, see preprocess_image_for_detection
+        
+    Returns:
+        List of (processed_image, metadata), in input order
+    """
+    if not enable_low_light_mode:
+        return [
+            (image, {"preprocessing_applied": [], "low_light": {"enabled": False}})
+            for image in images
+        ]
+    
+    brightness = np.fromiter(
+        (_calculate_brightness_pil(image) for image in images),
+        dtype=np.float64,
+        count=len(images)
+    )
+    
+    results = [
+        (image, {
+            "preprocessing_applied": [],
+            "low_light": _bright_image_metadata(float(value), brightness_threshold),
+        })
+        for image, value in zip(images, brightness)
+    ]
+    
+    for i in np.flatnonzero(brightness < brightness_threshold):
+        results[i] = _enhance_dark_image(
+            images[i], float(brightness[i]), low_light_method,
+            brightness_threshold, target_size, {"preprocessing_applied": []}
+        )
+    
+    return results
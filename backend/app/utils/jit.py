@@ -0,0 +1,42 @@
+"""
+Optional Numba JIT helpers
+
+Numba is not a hard dependency. When it is installed, kernels decorated with
+`njit(signature)` are compiled eagerly at import time (explicit signature) and
+cached on disk (cache=True), so neither the first frame nor later process
+starts pay LLVM compilation on the request path. Without Numba the decorated
+functions run as plain Python/NumPy.
+"""
+
+from typing import Callable, List, Optional, Union
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def njit(signature: Optional[Union[str, List[str]]] = None, **options) -> Callable:
+    """
+    Decorator: numba.njit with on-disk caching, or a no-op without Numba
+
+    Args:
+        signature: Numba type signature, or a list of them (one compiled
+            specialization each). Passing one compiles at decoration time
+            instead of on first call; other argument types are rejected.
+        **options: Extra numba.njit options (fastmath, parallel, ...)
+
+    Returns:
+        Decorator
+    """
+    if not NUMBA_AVAILABLE:
+        def passthrough(func: Callable) -> Callable:
+            return func
+        return passthrough
+
+    options.setdefault("cache", True)
+    if signature is None:
+        return numba.njit(**options)
+    return numba.njit(signature, **options)
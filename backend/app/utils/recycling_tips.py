@@ -4,6 +4,7 @@ Recycling Tips Database (Vietnamese)
 Provides detailed recycling instructions and tips for each waste class
 """
 
+from functools import lru_cache
 from typing import List, Dict
 
 
@@ -352,6 +353,7 @@ def get_special_instruction(material_type: str) -> Dict:
     return SPECIAL_INSTRUCTIONS.get(material_type, {})
 
 
+@lru_cache(maxsize=64)
 def get_simple_tips(class_name: str) -> List[str]:
     """
     Get simple list of tips (just the steps, no icons/details)
@@ -360,12 +362,13 @@ def get_simple_tips(class_name: str) -> List[str]:
         class_name: One of 9 waste classes
         
     Returns:
-        List of tip strings
+        List of tip strings (memoized and shared: do not mutate)
     """
     tips = get_recycling_tips(class_name)
     return [tip["step"] for tip in tips]
 
 
+@lru_cache(maxsize=64)
 def get_tips_with_icons(class_name: str) -> List[str]:
     """
     Get tips formatted with icons
@@ -374,7 +377,7 @@ def get_tips_with_icons(class_name: str) -> List[str]:
         class_name: One of 9 waste classes
         
     Returns:
-        List of formatted tip strings
+        List of formatted tip strings (memoized and shared: do not mutate)
     """
     tips = get_recycling_tips(class_name)
     return [f"{tip['icon']} {tip['step']}" for tip in tips]
\ No newline at end of file
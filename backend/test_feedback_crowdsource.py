@@ -3,11 +3,17 @@ Test script for feedback and crowdsourcing endpoints
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 from pathlib import Path
 
 BASE_URL = "http://127.0.0.1:8000/api/v1"
 
+# One keep-alive session for all calls (pooled connections, no per-request
+# TCP handshake)
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 def test_feedback():
     """Test feedback submission"""
     print("\n" + "=" * 60)
@@ -22,7 +28,7 @@ def test_feedback():
         "user_id": "test_user"
     }
     
-    response = requests.post(f"{BASE_URL}/feedback/submit", json=feedback_data)
+    response = SESSION.post(f"{BASE_URL}/feedback/submit", json=feedback_data)
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     
@@ -35,19 +41,19 @@ def test_feedback():
         "user_id": "test_user"
     }
     
-    response = requests.post(f"{BASE_URL}/feedback/submit", json=feedback_data)
+    response = SESSION.post(f"{BASE_URL}/feedback/submit", json=feedback_data)
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     
     # Test getting feedback stats
     print("\n3. Getting feedback statistics...")
-    response = requests.get(f"{BASE_URL}/feedback/stats")
+    response = SESSION.get(f"{BASE_URL}/feedback/stats")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     
     # Test getting recent feedback
     print("\n4. Getting recent feedback...")
-    response = requests.get(f"{BASE_URL}/feedback/recent?limit=5")
+    response = SESSION.get(f"{BASE_URL}/feedback/recent?limit=5")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
 
@@ -79,19 +85,19 @@ def test_crowdsource():
             'user_id': 'test_user'
         }
         
-        response = requests.post(f"{BASE_URL}/crowdsource/submit", files=files, data=data)
+        response = SESSION.post(f"{BASE_URL}/crowdsource/submit", files=files, data=data)
         print(f"Status: {response.status_code}")
         print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     
     # Test getting crowdsource stats
     print("\n2. Getting crowdsourcing statistics...")
-    response = requests.get(f"{BASE_URL}/crowdsource/stats")
+    response = SESSION.get(f"{BASE_URL}/crowdsource/stats")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     
     # Test getting crowdsourced images
     print("\n3. Getting crowdsourced images...")
-    response = requests.get(f"{BASE_URL}/crowdsource/images?limit=5")
+    response = SESSION.get(f"{BASE_URL}/crowdsource/images?limit=5")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
 
@@ -102,7 +108,7 @@ if __name__ == "__main__":
     
     try:
         # Test health endpoint first
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
             print(" Server is running!")
         else:
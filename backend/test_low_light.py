@@ -8,6 +8,7 @@ import numpy as np
 from PIL import Image
 from pathlib import Path
 import sys
+import time
 
 # Add backend to path
 sys.path.append(str(Path(__file__).parent))
@@ -20,6 +21,7 @@ from app.utils.image_preprocessing import (
     auto_enhance_low_light,
     preprocess_image_for_detection
 )
+from app.utils.jit import NUMBA_AVAILABLE
 
 def create_dark_test_image(output_path: Path):
     """Create a dark test image for testing"""
@@ -141,6 +143,44 @@ def test_full_preprocessing():
     
     print(f"\n Preprocessing test complete")
 
+def test_readonly_frame_brightness():
+    """Read-only frames (np.asarray of a PIL image) take the same kernel path"""
+    print("\n" + "=" * 60)
+    print("Testing Read-Only Frame Brightness")
+    print("=" * 60)
+    
+    frame = np.asarray(Image.new('RGB', (640, 480), (40, 80, 120)))
+    assert not frame.flags.writeable
+    
+    readonly_brightness = calculate_brightness(frame)
+    writable_brightness = calculate_brightness(frame.copy())
+    assert abs(readonly_brightness - writable_brightness) < 1e-6, (readonly_brightness, writable_brightness)
+    
+    print(f"\n   Read-only frame brightness: {readonly_brightness:.1f}")
+
+def test_video_frame_throughput(num_frames: int = 300):
+    """Time the per-frame brightness probe and gamma LUT over a burst of frames"""
+    print("\n" + "=" * 60)
+    print("Testing Per-Frame Throughput")
+    print("=" * 60)
+    print(f"Numba brightness kernel: {'enabled' if NUMBA_AVAILABLE else 'not installed (NumPy fallback)'}")
+    
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 90, size=(8, 480, 640, 3), dtype=np.uint8)
+    
+    start = time.perf_counter()
+    for i in range(num_frames):
+        calculate_brightness(frames[i % len(frames)])
+    brightness_ms = (time.perf_counter() - start) * 1000 / num_frames
+    
+    start = time.perf_counter()
+    for i in range(num_frames):
+        enhance_brightness_gamma(frames[i % len(frames)], gamma=1.5)
+    gamma_ms = (time.perf_counter() - start) * 1000 / num_frames
+    
+    print(f"\n   Brightness probe: {brightness_ms:.3f} ms/frame")
+    print(f"   Gamma (cached LUT): {gamma_ms:.3f} ms/frame")
+
 if __name__ == "__main__":
     print("\n Testing Low-Light Mode Preprocessing")
     print("=" * 60)
@@ -149,6 +189,8 @@ if __name__ == "__main__":
         test_low_light_detection()
         test_enhancement_methods()
         test_full_preprocessing()
+        test_readonly_frame_brightness()
+        test_video_frame_throughput()
         
         print("\n" + "=" * 60)
         print(" All tests completed successfully!")
@@ -4,15 +4,35 @@ Connects to WebSocket endpoint and streams camera frames
 """
 
 import cv2
+import numpy as np
 import asyncio
 import websockets
 import json
-import base64
 from pathlib import Path
 
+# orjson (optional): faster parsing of the per-frame responses
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# PyTurboJPEG (optional): encodes straight to bytes; cv2.imencode otherwise
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    TURBO_JPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    TURBO_JPEG = None
+
 # WebSocket URL
 WS_URL = "ws://127.0.0.1:8000/api/v1/ws/realtime-detect"
 
+# JPEG encoding for frames sent to the server
+JPEG_QUALITY = 80
+JPEG_PARAMS = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+
+# Frames sent but not yet answered by the server
+MAX_FRAMES_IN_FLIGHT = 2
+
 # Colors for different bin types
 BIN_COLORS = {
     "recyclable": (0, 255, 0),      # Green
@@ -21,6 +41,18 @@ BIN_COLORS = {
     "general": (128, 128, 128)      # Gray
 }
 
+# Rendered label sizes, keyed by label text (bounded: class x 0.1% steps)
+LABEL_SIZE_CACHE = {}
+
+def label_size(label):
+    """(width, height) of a box label, measured once per distinct text"""
+    size = LABEL_SIZE_CACHE.get(label)
+    if size is None:
+        size = LABEL_SIZE_CACHE[label] = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
+        )[0]
+    return size
+
 def draw_detections(frame, detections):
     """Draw bounding boxes and labels on frame"""
     for detection in detections:
@@ -40,9 +72,7 @@ def draw_detections(frame, detections):
         label = f"{class_name_en} {confidence:.1f}%"
         
         # Draw label background
-        (label_width, label_height), _ = cv2.getTextSize(
-            label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-        )
+        label_width, label_height = label_size(label)
         cv2.rectangle(
             frame,
             (x1, y1 - label_height - 10),
@@ -64,6 +94,127 @@ def draw_detections(frame, detections):
     
     return frame
 
+def draw_response(frame, response, frame_count):
+    """Draw a server response (detections, info and timing overlays) on frame"""
+    if response.get("success"):
+        data = response["data"]
+        detections = data["detections"]
+        total_objects = data["total_objects"]
+        
+        # Draw detections on frame
+        frame = draw_detections(frame, detections)
+        
+        # Draw info overlay
+        info_text = f"Frame: {frame_count} | Objects: {total_objects}"
+        cv2.putText(
+            frame,
+            info_text,
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2
+        )
+        
+        # Show metadata if available
+        if "metadata" in response:
+            meta = response["metadata"]
+            fps_text = f"FPS: {meta.get('fps', 0):.1f} | Time: {meta.get('processing_time_ms', 0):.1f}ms"
+            cv2.putText(
+                frame,
+                fps_text,
+                (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (0, 255, 255),
+                2
+            )
+        
+        # Print detection summary
+        if total_objects > 0 and frame_count % 30 == 0:  # Print every 30 frames
+            print(f"Frame {frame_count}: Detected {total_objects} objects")
+            for det in detections[:3]:  # Show first 3
+                print(f"  - {det['class_name']}: {det['confidence']:.1f}%")
+    
+    else:
+        error = response.get("error", "Unknown error")
+        cv2.putText(
+            frame,
+            f"Error: {error}",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 0, 255),
+            2
+        )
+    
+    return frame
+
+def encode_jpeg(frame):
+    """Encode a BGR frame to JPEG bytes"""
+    if TURBO_JPEG is not None:
+        return TURBO_JPEG.encode(frame, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
+    _, buffer = cv2.imencode('.jpg', frame, JPEG_PARAMS)
+    return buffer.tobytes()
+
+def put_latest(queue, item):
+    """Put item on a bounded queue, dropping the oldest entry when full"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+async def capture_frames(cap, frame_queue, stop):
+    """Stage 1: read camera frames in a worker thread, keep only the newest"""
+    loop = asyncio.get_running_loop()
+    frame_count = 0
+    while not stop.is_set():
+        ret, frame = await loop.run_in_executor(None, cap.read)
+        if not ret:
+            print(" Error: Could not read frame")
+            break
+        # Some capture backends hand back row-padded buffers; make them
+        # contiguous once here rather than in every downstream copy
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = np.ascontiguousarray(frame)
+        frame_count += 1
+        put_latest(frame_queue, (frame_count, frame))
+    stop.set()
+
+def reply_frame_number(response):
+    """Server-side frame counter a reply refers to (None if missing)"""
+    data = response.get("data")
+    if isinstance(data, dict):
+        return data.get("frame_count")
+    return response.get("frame_count")
+
+async def send_frames(websocket, frame_queue, in_flight, pending, stop):
+    """Stage 2: JPEG-encode in a worker thread and send, bounded by in_flight"""
+    loop = asyncio.get_running_loop()
+    # The server numbers every message it receives on this connection from 1
+    sent = 0
+    while not stop.is_set():
+        frame_count, frame = await frame_queue.get()
+        await in_flight.acquire()
+        jpeg_bytes = await loop.run_in_executor(None, encode_jpeg, frame)
+        sent += 1
+        pending[sent] = (frame_count, frame)
+        await websocket.send(jpeg_bytes)
+
+async def receive_results(websocket, in_flight, pending, render_queue, stop):
+    """Stage 3: pair each response with the frame it belongs to"""
+    while not stop.is_set():
+        response_str = await websocket.recv()
+        response = json_loads(response_str)
+        # Results are broadcast to every connected client, so replies to
+        # other clients arrive here too; only a reply whose frame number is
+        # pending frees an in-flight slot
+        match = pending.pop(reply_frame_number(response), None)
+        if match is None:
+            continue
+        in_flight.release()
+        frame_count, frame = match
+        put_latest(render_queue, (frame_count, frame, response))
+
 async def test_realtime_camera():
     """Main function to test realtime camera detection"""
     print("=" * 60)
@@ -82,98 +233,57 @@ async def test_realtime_camera():
     
     print(" Webcam opened successfully")
     
+    # Request MJPG (decoded with libjpeg-turbo) instead of raw YUYV, and keep
+    # only the newest frame in the driver buffer. Must be set before the size.
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
     # Set camera resolution (optional)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cap.set(cv2.CAP_PROP_FPS, 30)
     
+    tasks = []
     try:
         async with websockets.connect(WS_URL) as websocket:
             print(" Connected to WebSocket server")
             
-            frame_count = 0
+            # Capture, encode/send and receive run concurrently so network
+            # round trips overlap with capture and encoding; rendering stays
+            # on this (main) thread for imshow
+            stop = asyncio.Event()
+            frame_queue = asyncio.Queue(maxsize=2)
+            render_queue = asyncio.Queue(maxsize=1)
+            in_flight = asyncio.Semaphore(MAX_FRAMES_IN_FLIGHT)
+            pending = {}
             
-            while True:
-                # Capture frame
-                ret, frame = cap.read()
-                
-                if not ret:
-                    print(" Error: Could not read frame")
-                    break
-                
-                frame_count += 1
-                
-                # Encode frame to JPEG
-                _, buffer = cv2.imencode('.jpg', frame)
-                
-                # Convert to base64
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                # Send frame to server
-                await websocket.send(frame_base64)
-                
-                # Receive response
-                response_str = await websocket.recv()
-                response = json.loads(response_str)
-                
-                if response.get("success"):
-                    data = response["data"]
-                    detections = data["detections"]
-                    total_objects = data["total_objects"]
-                    
-                    # Draw detections on frame
-                    frame = draw_detections(frame, detections)
-                    
-                    # Draw info overlay
-                    info_text = f"Frame: {frame_count} | Objects: {total_objects}"
-                    cv2.putText(
-                        frame,
-                        info_text,
-                        (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        (0, 255, 0),
-                        2
-                    )
-                    
-                    # Show metadata if available
-                    if "metadata" in response:
-                        meta = response["metadata"]
-                        fps_text = f"FPS: {meta.get('fps', 0):.1f} | Time: {meta.get('processing_time_ms', 0):.1f}ms"
-                        cv2.putText(
-                            frame,
-                            fps_text,
-                            (10, 60),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6,
-                            (0, 255, 255),
-                            2
-                        )
-                    
-                    # Print detection summary
-                    if total_objects > 0 and frame_count % 30 == 0:  # Print every 30 frames
-                        print(f"Frame {frame_count}: Detected {total_objects} objects")
-                        for det in detections[:3]:  # Show first 3
-                            print(f"  - {det['class_name']}: {det['confidence']:.1f}%")
+            tasks = [
+                asyncio.create_task(capture_frames(cap, frame_queue, stop)),
+                asyncio.create_task(send_frames(websocket, frame_queue, in_flight, pending, stop)),
+                asyncio.create_task(receive_results(websocket, in_flight, pending, render_queue, stop)),
+            ]
+            
+            while not stop.is_set():
+                try:
+                    frame_count, frame, response = await asyncio.wait_for(render_queue.get(), timeout=0.1)
+                except asyncio.TimeoutError:
+                    # Surface stage failures (e.g. connection closed)
+                    for task in tasks:
+                        if task.done() and task.exception():
+                            raise task.exception()
+                    continue
                 
-                else:
-                    error = response.get("error", "Unknown error")
-                    cv2.putText(
-                        frame,
-                        f"Error: {error}",
-                        (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6,
-                        (0, 0, 255),
-                        2
-                    )
+                frame = draw_response(frame, response, frame_count)
                 
                 # Display frame
                 cv2.imshow('YOLO Realtime Detection', frame)
                 
                 # Check for quit
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                if cv2.pollKey() & 0xFF == ord('q'):
                     print("\n Quitting...")
                     break
+            
+            stop.set()
     
     except websockets.exceptions.ConnectionClosed:
         print(" WebSocket connection closed")
@@ -182,6 +292,9 @@ async def test_realtime_camera():
         import traceback
         traceback.print_exc()
     finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         # Release resources
         cap.release()
         cv2.destroyAllWindows()
@@ -1,7 +1,18 @@
 import os
 import sys
+import shutil
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# Copy buffer for downloads (large chunks keep the loop inside C)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
 
 # Cấu hình URL model (BẠN CẦN CẬP NHẬT LINK NÀY SAU KHI UPLOAD LÊN DRIVE/HUGGINGFACE)
 # Ví dụ: Link Google Drive public hoặc direct link
@@ -12,7 +23,15 @@ MODEL_URLS = {
 
 DEST_DIR = Path(__file__).parent.parent / "models"
 
-def download_file(url, text, dest_path):
+def make_session():
+    """Shared HTTP session (connection pool) for all downloads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def download_file(url, text, dest_path, session=None):
     print(f"Downloading {text}...")
     try:
         if url.startswith("LINK_"):
@@ -20,12 +39,17 @@ def download_file(url, text, dest_path):
             print(f"👉 Vui lòng tải thủ công file '{dest_path.name}' và bỏ vào thư mục 'models/'")
             return False
             
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        with open(dest_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with (session or requests).get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            total = int(response.headers.get("Content-Length", 0)) or None
+            
+            with open(dest_path, "wb") as f:
+                if tqdm is not None:
+                    with tqdm.wrapattr(response.raw, "read", total=total, desc=text) as raw:
+                        shutil.copyfileobj(raw, f, length=DOWNLOAD_CHUNK_SIZE)
+                else:
+                    shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
         print(f"✅ Đã tải xong: {dest_path}")
         return True
     except Exception as e:
@@ -41,15 +65,24 @@ def main():
     print("Lưu ý: Bạn cần cập nhật link download trong scripts/download_models.py trước khi chạy.")
     
     success_count = 0
+    pending = {}
     for filename, url in MODEL_URLS.items():
         dest = DEST_DIR / filename
         if dest.exists():
             print(f"⚠️  File {filename} đã tồn tại, bỏ qua.")
             success_count += 1
             continue
-            
-        if download_file(url, filename, dest):
-            success_count += 1
+        pending[filename] = url
+    
+    # Downloads are network-bound: run them in parallel on one session
+    if pending:
+        with make_session() as session, ThreadPoolExecutor(max_workers=min(4, len(pending))) as ex:
+            futures = [
+                ex.submit(download_file, url, filename, DEST_DIR / filename, session)
+                for filename, url in pending.items()
+            ]
+            for future in as_completed(futures):
+                success_count += bool(future.result())
 
     if success_count == len(MODEL_URLS):
         print("\n✅ TẤT CẢ MODEL ĐÃ SẴN SÀNG!")
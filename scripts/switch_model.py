@@ -1,9 +1,155 @@
 import shutil
 import os
+import argparse
 import datetime
 from pathlib import Path
 
-def switch_to_new_model():
+# Use same path resolution as train_optimized.py
+PROJECT_ROOT = Path.home() / "waste-classification-vn"
+
+# TensorRT export settings
+IMAGE_SIZE = 640
+TRT_WORKSPACE_GB = 4
+INT8_MAX_MAP_DROP = 0.01  # Max mAP50-95 loss vs FP16 accepted for the INT8 engine
+CALIBRATION_DIR = PROJECT_ROOT / "calibration"
+CALIBRATION_YAML = CALIBRATION_DIR / "calib.yaml"
+
+
+# ioctl request for a reflink (copy-on-write) clone on btrfs/xfs
+FICLONE = 0x40049409
+
+
+def fast_copy(src: Path, dst: Path):
+    """
+    Copy a file with metadata, as a reflink when the filesystem allows it.
+    
+    A FICLONE reflink shares the data blocks (no bytes are moved). Otherwise
+    shutil.copy2 is used, which already copies via os.sendfile on Linux.
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return
+    except (ImportError, OSError):
+        pass
+    shutil.copy2(src, dst)
+
+
+def capture_calibration_frames(model_path: Path, num_frames: int = 300, camera_index: int = 0) -> bool:
+    """
+    Capture representative camera frames for INT8 calibration.
+    
+    Saves frames to calibration/images and writes calibration/calib.yaml
+    (dataset YAML pointing at them) for the TensorRT INT8 export.
+    """
+    import cv2
+    import yaml
+    from ultralytics import YOLO
+    
+    if not model_path.exists():
+        print(f"❌ {model_path} not found (class names are read from it)")
+        return False
+    
+    images_dir = CALIBRATION_DIR / "images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n📷 Capturing {num_frames} calibration frames from camera {camera_index}...")
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        print("❌ Could not open camera")
+        return False
+    
+    saved = 0
+    try:
+        while saved < num_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(str(images_dir / f"calib_{saved:04d}.jpg"), frame)
+            saved += 1
+    finally:
+        cap.release()
+    
+    if saved == 0:
+        print("❌ No frames captured")
+        return False
+    
+    names = YOLO(str(model_path)).names
+    with open(CALIBRATION_YAML, "w", encoding="utf-8") as f:
+        yaml.safe_dump(
+            {"path": str(CALIBRATION_DIR), "train": "images", "val": "images", "names": names},
+            f, allow_unicode=True
+        )
+    print(f"✅ Saved {saved} frames, calibration data: {CALIBRATION_YAML}")
+    return True
+
+
+def export_tensorrt_engines(model_path: Path, data_yaml: str = None):
+    """
+    Export TensorRT engines next to the installed weights.
+    
+    Produces <name>_fp16.engine, then <name>.engine (INT8) calibrated on
+    calibration/calib.yaml (or the training dataset). The INT8 engine is
+    kept only if its mAP50-95 on the validation set is within
+    INT8_MAX_MAP_DROP of the FP16 engine. The backend prefers the INT8
+    engine, then FP16, then the .pt weights.
+    """
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        print("\n⚠️  ultralytics not installed, skipping TensorRT export")
+        return
+    
+    int8_engine = model_path.with_suffix(".engine")
+    fp16_engine = model_path.with_name(f"{model_path.stem}_fp16.engine")
+    
+    # Engines built from the previous weights must not outlive them
+    for stale in (int8_engine, fp16_engine):
+        if stale.exists():
+            stale.unlink()
+    
+    print(f"\n⚙️  Exporting TensorRT engines (imgsz={IMAGE_SIZE})...")
+    try:
+        # FP16 engine (fallback)
+        exported = YOLO(str(model_path)).export(
+            format="engine", half=True, imgsz=IMAGE_SIZE, workspace=TRT_WORKSPACE_GB
+        )
+        Path(exported).replace(fp16_engine)
+        print(f"   FP16: {fp16_engine.name}")
+        
+        calib_data = str(CALIBRATION_YAML) if CALIBRATION_YAML.exists() else data_yaml
+        if calib_data is None:
+            print("⚠️  No calibration data (run with --capture-calib), skipping INT8 engine")
+            return
+        
+        # INT8 engine (export writes <name>.engine next to the weights)
+        exported = YOLO(str(model_path)).export(
+            format="engine", int8=True, data=calib_data,
+            imgsz=IMAGE_SIZE, workspace=TRT_WORKSPACE_GB
+        )
+        if Path(exported) != int8_engine:
+            Path(exported).replace(int8_engine)
+        print(f"   INT8: {int8_engine.name} (calibration: {calib_data})")
+        
+        if data_yaml is None:
+            print("⚠️  No validation dataset found, keeping INT8 engine unvalidated")
+            return
+        
+        # Validate INT8 against FP16 before letting the backend use it
+        fp16_map = YOLO(str(fp16_engine), task="detect").val(data=data_yaml, imgsz=IMAGE_SIZE, half=True).box.map
+        int8_map = YOLO(str(int8_engine), task="detect").val(data=data_yaml, imgsz=IMAGE_SIZE, int8=True).box.map
+        print(f"   mAP50-95: FP16 {fp16_map:.4f} | INT8 {int8_map:.4f}")
+        if fp16_map - int8_map > INT8_MAX_MAP_DROP:
+            int8_engine.unlink()
+            print(f"⚠️  INT8 accuracy drop > {INT8_MAX_MAP_DROP}, removed INT8 engine (FP16 will be used)")
+    except Exception as e:
+        print(f"⚠️  TensorRT export failed: {e}")
+        print("   The backend will load the .pt weights")
+
+
+def switch_to_new_model(export_engine: bool = True):
     """
     Switch to the latest trained model.
     
@@ -12,10 +158,9 @@ def switch_to_new_model():
     2. Locates the best.pt model file
     3. Backs up the current model
     4. Copies the new model to models/yolov8s_best.pt
+    5. Exports TensorRT engines next to it (unless export_engine=False)
     """
     # Configuration
-    # Use same path resolution as train_optimized.py
-    PROJECT_ROOT = Path.home() / "waste-classification-vn"
     TRAINING_DIR = PROJECT_ROOT / "runs/detect"
     DESTINATION_DIR = PROJECT_ROOT / "models"
     MODEL_FILENAME = "yolov8s_best.pt"
@@ -34,20 +179,19 @@ def switch_to_new_model():
     print("=" * 70)
     
     # 1. Find the latest training run
-    # Look for folders matching any of the patterns
-    all_runs = []
-    for pattern in TRAINING_PATTERNS:
-        matching_runs = [d for d in TRAINING_DIR.iterdir() 
-                        if d.is_dir() and pattern in d.name]
-        all_runs.extend(matching_runs)
+    # Look for folders matching any of the patterns (one scandir pass per
+    # directory; each run is stat'ed once and its mtime reused below)
+    def scan_runs(directory):
+        with os.scandir(directory) as it:
+            return [(Path(entry.path), entry.stat().st_mtime) for entry in it
+                    if entry.is_dir() and any(pattern in entry.name for pattern in TRAINING_PATTERNS)]
+    
+    all_runs = scan_runs(TRAINING_DIR)
     
     # Also check nested runs/detect structure (YOLO sometimes creates this)
     nested_detect = TRAINING_DIR / "runs" / "detect"
     if nested_detect.exists():
-        for pattern in TRAINING_PATTERNS:
-            matching_runs = [d for d in nested_detect.iterdir() 
-                            if d.is_dir() and pattern in d.name]
-            all_runs.extend(matching_runs)
+        all_runs.extend(scan_runs(nested_detect))
     
     if not all_runs:
         print("❌ No training runs found!")
@@ -57,19 +201,20 @@ def switch_to_new_model():
     
     # Sort by modification time (newest first)
     # This ensures we always pick the most recently trained model
-    runs = sorted(all_runs, key=lambda x: x.stat().st_mtime, reverse=True)
+    runs = sorted(all_runs, key=lambda run: run[1], reverse=True)
     
     # Display all found runs
     print(f"\n📁 Found {len(runs)} training run(s):")
-    for i, run in enumerate(runs[:5], 1):  # Show top 5
-        mtime = datetime.datetime.fromtimestamp(run.stat().st_mtime)
-        age = datetime.datetime.now() - mtime
+    now = datetime.datetime.now()
+    for i, (run, run_mtime) in enumerate(runs[:5], 1):  # Show top 5
+        mtime = datetime.datetime.fromtimestamp(run_mtime)
+        age = now - mtime
         age_str = f"{age.days}d {age.seconds//3600}h ago" if age.days > 0 else f"{age.seconds//3600}h {age.seconds//60%60}m ago"
         marker = " ⭐ NEWEST" if i == 1 else ""
         print(f"   {i}. {run.name} (modified: {mtime.strftime('%Y-%m-%d %H:%M:%S')}, {age_str}){marker}")
     
     # Select the newest run (first in sorted list)
-    latest_run = runs[0]
+    latest_run = runs[0][0]
     print(f"\n✅ Selected: {latest_run.name} (most recently modified)")
     new_model_path = latest_run / "weights" / "best.pt"
     
@@ -96,7 +241,7 @@ def switch_to_new_model():
         current_size_mb = current_model.stat().st_size / (1024 * 1024)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = DESTINATION_DIR / f"yolov8s_backup_{timestamp}.pt"
-        shutil.copy2(current_model, backup_path)
+        fast_copy(current_model, backup_path)
         print(f"\n💾 Backed up current model:")
         print(f"   From: {current_model.name} ({current_size_mb:.1f} MB)")
         print(f"   To: {backup_path.name}")
@@ -106,7 +251,17 @@ def switch_to_new_model():
     
     # 3. Copy new model
     print(f"\n📋 Copying new model...")
-    shutil.copy2(new_model_path, current_model)
+    fast_copy(new_model_path, current_model)
+    
+    # 4. Export TensorRT engines (validated against the training dataset)
+    if export_engine:
+        data_yaml = None
+        args_file = latest_run / "args.yaml"
+        if args_file.exists():
+            import yaml
+            with open(args_file, encoding="utf-8") as f:
+                data_yaml = yaml.safe_load(f).get("data")
+        export_tensorrt_engines(current_model, data_yaml)
     
     print("\n" + "=" * 70)
     print(" SUCCESS! New model installed.")
@@ -117,4 +272,15 @@ def switch_to_new_model():
     print("=" * 70)
 
 if __name__ == "__main__":
-    switch_to_new_model()
+    parser = argparse.ArgumentParser(description="Install the latest trained model")
+    parser.add_argument("--no-export", action="store_true",
+                        help="Skip the TensorRT engine export")
+    parser.add_argument("--capture-calib", type=int, metavar="N", default=0,
+                        help="Capture N camera frames for INT8 calibration first (200-500 recommended)")
+    args = parser.parse_args()
+    
+    if args.capture_calib:
+        capture_calibration_frames(
+            PROJECT_ROOT / "models" / "yolov8s_best.pt", num_frames=args.capture_calib
+        )
+    switch_to_new_model(export_engine=not args.no_export)
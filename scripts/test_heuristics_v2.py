@@ -8,6 +8,9 @@ sys.path.append(str(Path("/Users/caoduong22102004gmail.com/waste-classification-
 
 from app.core.config import settings
 from app.api.v1.realtime import DetectionTracker, process_frame_yolo
+from app.utils.detection_filters import (
+    FRAME_AREA, PASSED, REJECT_REASONS, check_constraints_batch, constraint_tables
+)
 from PIL import Image
 import numpy as np
 
@@ -86,27 +89,21 @@ def test_stability_logic():
     
     print("\n3. Testing Constraint Logic (Simulated):")
     
+    # Same njit kernel process_frame_yolo uses. The class threshold and
+    # minimum-area floors are zeroed so only the size/aspect constraints apply.
+    class_names = tuple(settings.CLASS_SIZE_CONSTRAINTS)
+    _, _, _, max_areas, min_aspects, max_aspects = constraint_tables(class_names)
+    no_floor = np.zeros(len(class_names))
+    
     def check_constraints(class_name_en, conf, box):
-        x1, y1, x2, y2 = box
-        width = x2 - x1
-        height = y2 - y1
-        area_ratio = (width * height) / (640 * 480)
-        aspect_ratio = width / height if height > 0 else 1.0
-        
-        constraints = settings.CLASS_SIZE_CONSTRAINTS.get(class_name_en)
-        if constraints:
-            max_area = constraints.get("max_area", 1.0)
-            if area_ratio > max_area:
-                if conf < 0.85: return False, "Exceeded max area"
-            
-            min_aspect = constraints.get("min_aspect")
-            max_aspect = constraints.get("max_aspect")
-            if min_aspect and aspect_ratio < min_aspect:
-                if conf < 0.80: return False, "Failed min aspect"
-            if max_aspect and aspect_ratio > max_aspect:
-                if conf < 0.80: return False, "Failed max aspect"
-        
-        return True, "Passed"
+        codes = check_constraints_batch(
+            np.array([box], dtype=np.float64),
+            np.array([conf], dtype=np.float64),
+            np.array([class_names.index(class_name_en)], dtype=np.int64),
+            no_floor, no_floor, max_areas, min_aspects, max_aspects,
+            FRAME_AREA
+        )
+        return codes[0] == PASSED, REJECT_REASONS[codes[0]]
 
     # Battery covering 50% of screen (False positive)
     ok, msg = check_constraints("battery", 0.70, [0, 0, 320, 480]) # 50% area
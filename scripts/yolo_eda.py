@@ -1,11 +1,15 @@
 import os
+import warnings
 import yaml
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import cv2
 import numpy as np
+from PIL import Image
 from tqdm import tqdm
 import json
 
@@ -13,27 +17,55 @@ import json
 sns.set_theme(style="whitegrid")
 plt.rcParams['font.family'] = 'sans-serif'
 
+# Header reads and label parsing are I/O bound, so threads scale past the GIL
+EDA_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Empty label files are valid (background images) and are skipped by size, but
+# whitespace-only ones still reach loadtxt. Filtered once at import because
+# warnings.catch_warnings is not thread-safe inside the scan pool.
+warnings.filterwarnings("ignore", message="loadtxt: input contained no data", category=UserWarning)
+
+# Centroid KDE sample size (the KDE itself is O(points x grid))
+KDE_MAX_POINTS = 20000
+
+# Image suffixes picked up by the dataset scans (compared lower-cased)
+CLASSIFICATION_IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+YOLO_IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".png"})
+
+# EXIF Orientation tag; values 5-8 are rotated by 90/270 degrees, so the
+# displayed (cv2.imread) width and height are swapped vs the stored size
+EXIF_ORIENTATION = 0x0112
+EXIF_SWAPPED_ORIENTATIONS = frozenset({5, 6, 7, 8})
+
+def list_images(directory, exts):
+    """List image files in a directory with a single scandir pass"""
+    with os.scandir(directory) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in exts and entry.is_file()
+        ]
+
 def analyze_classification_dataset(dataset_path):
     """Analyze a dataset in classification format (folder per class)"""
     print(f"--- Analyzing Classification Dataset: {dataset_path} ---")
-    data = []
+    # One list per column; the class column is filled in per-folder runs
+    classes, paths, filenames = [], [], []
     
     # Iterate through class folders
-    for class_folder in dataset_path.iterdir():
-        if class_folder.is_dir():
-            class_name = class_folder.name
-            images = list(class_folder.glob("*.j*pg")) + list(class_folder.glob("*.png")) + list(class_folder.glob("*.webp"))
-            
-            for img_path in images:
-                # Basic image stats without opening for speed first, 
-                # but we need size for EDA
-                data.append({
-                    "class": class_name,
-                    "path": str(img_path),
-                    "filename": img_path.name
-                })
-    
-    df = pd.DataFrame(data)
+    with os.scandir(dataset_path) as entries:
+        class_folders = [entry for entry in entries if entry.is_dir()]
+    for class_folder in class_folders:
+        class_name = class_folder.name
+        # One directory listing per class instead of one glob per extension
+        images = list_images(class_folder.path, CLASSIFICATION_IMAGE_EXTS)
+        
+        # Basic image stats without opening for speed first, 
+        # but we need size for EDA
+        classes.extend([class_name] * len(images))
+        paths.extend(map(str, images))
+        filenames.extend(img_path.name for img_path in images)
+    
+    df = pd.DataFrame({"class": classes, "path": paths, "filename": filenames})
     if df.empty:
         print("No data found in classification dataset.")
         return None
@@ -42,6 +74,82 @@ def analyze_classification_dataset(dataset_path):
     print(df['class'].value_counts())
     return df
 
+def get_image_size(img_path):
+    """Return (width, height) from the file header without decoding pixels"""
+    try:
+        # PIL opens lazily and only parses the header until .load()
+        with Image.open(img_path) as im:
+            width, height = im.size
+            if im.getexif().get(EXIF_ORIENTATION) in EXIF_SWAPPED_ORIENTATIONS:
+                return height, width
+            return width, height
+    except Exception:
+        img = cv2.imread(str(img_path))
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        return w, h
+
+def load_yolo_labels(lbl_path):
+    """Parse a YOLO label file into an (N, 5) float32 array of cls, x, y, w, h"""
+    try:
+        labels = np.loadtxt(lbl_path, dtype=np.float32, ndmin=2)
+    except ValueError:
+        # Ragged rows (e.g. stray segment lines): keep only the 5-column ones
+        with open(lbl_path, 'r') as f:
+            rows = [parts for parts in (line.split() for line in f) if len(parts) == 5]
+        labels = np.array(rows, dtype=np.float32).reshape(-1, 5)
+    if labels.shape[1] != 5:
+        return np.empty((0, 5), dtype=np.float32)
+    return labels
+
+def list_label_sizes(lbl_dir):
+    """Map label stem -> file size (bytes) with a single scandir pass"""
+    with os.scandir(lbl_dir) as entries:
+        return {
+            entry.name[:-4]: entry.stat().st_size for entry in entries
+            if entry.name.endswith(".txt") and entry.is_file()
+        }
+
+def process_yolo_image(img_path, lbl_dir, lbl_sizes):
+    """Return the (width, height) and label array for a single image"""
+    # Read image metadata
+    size = get_image_size(img_path)
+    if size is None:
+        return None, None
+    
+    # Missing and empty label files (negatives) are never opened
+    if not lbl_sizes.get(img_path.stem):
+        return size, None
+    return size, load_yolo_labels(lbl_dir / f"{img_path.stem}.txt")
+
+def lookup_class_names(cls_ids, class_names):
+    """Map class ids to names in one gather; out-of-range ids become Unknown(id)"""
+    # Indexing works for both list and {id: name} style data.yaml names
+    lookup = np.array([class_names[i] for i in range(len(class_names))] + [None], dtype=object)
+    valid = (cls_ids >= 0) & (cls_ids < len(class_names))
+    names = np.take(lookup, np.where(valid, cls_ids, len(class_names)))
+    if not valid.all():
+        # Only the distinct unknown ids need a formatted label
+        unknown_ids, inverse = np.unique(cls_ids[~valid], return_inverse=True)
+        names[~valid] = np.array([f"Unknown({i})" for i in unknown_ids], dtype=object)[inverse]
+    return names
+
+def labels_to_frame(labels, split, class_names):
+    """Build the bbox DataFrame for one split from its stacked label arrays"""
+    cls_ids = labels[:, 0].astype(np.int64)
+    df = pd.DataFrame({
+        "split": split,
+        "class_id": cls_ids,
+        "x_center": labels[:, 1],
+        "y_center": labels[:, 2],
+        "width": labels[:, 3],
+        "height": labels[:, 4],
+        "area": labels[:, 3] * labels[:, 4]
+    })
+    df.insert(2, "class_name", lookup_class_names(cls_ids, class_names))
+    return df
+
 def analyze_yolo_dataset(dataset_path):
     """Analyze a dataset in YOLO format"""
     print(f"\n--- Analyzing YOLO Dataset: {dataset_path} ---")
@@ -69,49 +177,38 @@ def analyze_yolo_dataset(dataset_path):
             print(f"Warning: {split} split directories missing.")
             continue
             
-        images = list(img_dir.glob("*.j*pg")) + list(img_dir.glob("*.png"))
+        images = list_images(img_dir, YOLO_IMAGE_EXTS)
         print(f"Analyzing {split} split ({len(images)} images)...")
         
-        for img_path in tqdm(images, desc=f"Processing {split}"):
-            # Read image metadata
-            img = cv2.imread(str(img_path))
-            if img is None:
-                continue
-            h, w = img.shape[:2]
-            image_stats.append({
-                "split": split,
-                "width": w,
-                "height": h,
-                "aspect_ratio": w / h
-            })
-            
-            # Read corresponding label
-            lbl_path = lbl_dir / f"{img_path.stem}.txt"
-            if lbl_path.exists():
-                with open(lbl_path, 'r') as f:
-                    lines = f.readlines()
-                    for line in lines:
-                        parts = line.strip().split()
-                        if len(parts) == 5:
-                            cls_id = int(parts[0])
-                            x_center = float(parts[1])
-                            y_center = float(parts[2])
-                            width = float(parts[3])
-                            height = float(parts[4])
-                            
-                            bboxes.append({
-                                "split": split,
-                                "class_id": cls_id,
-                                "class_name": class_names[cls_id] if cls_id < len(class_names) else f"Unknown({cls_id})",
-                                "x_center": x_center,
-                                "y_center": y_center,
-                                "width": width,
-                                "height": height,
-                                "area": width * height
-                            })
-    
-    df_bboxes = pd.DataFrame(bboxes)
-    df_images = pd.DataFrame(image_stats)
+        # Preallocated size columns, filled by index and trimmed afterwards
+        widths = np.empty(len(images), dtype=np.int32)
+        heights = np.empty(len(images), dtype=np.int32)
+        count = 0
+        split_labels = []
+        worker = partial(process_yolo_image, lbl_dir=lbl_dir, lbl_sizes=list_label_sizes(lbl_dir))
+        with ThreadPoolExecutor(max_workers=EDA_WORKERS) as executor:
+            results = executor.map(worker, images)
+            for size, labels in tqdm(results, total=len(images), desc=f"Processing {split}",
+                                     mininterval=1.0, miniters=256, smoothing=0.05):
+                if size is None:
+                    continue
+                widths[count], heights[count] = size
+                count += 1
+                if labels is not None and len(labels):
+                    split_labels.append(labels)
+        
+        widths, heights = widths[:count], heights[:count]
+        image_stats.append(pd.DataFrame({
+            "split": split,
+            "width": widths,
+            "height": heights,
+            "aspect_ratio": widths / heights
+        }))
+        if split_labels:
+            bboxes.append(labels_to_frame(np.concatenate(split_labels), split, class_names))
+    
+    df_bboxes = pd.concat(bboxes, ignore_index=True) if bboxes else pd.DataFrame()
+    df_images = pd.concat(image_stats, ignore_index=True) if image_stats else pd.DataFrame()
     
     return df_bboxes, df_images, class_names
 
@@ -119,53 +216,68 @@ def generate_visualizations(df_class, df_yolo_bbox, df_yolo_img, output_dir):
     """Generate and save EDA plots"""
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    # One figure reused (cleared and resized) for every plot
+    fig = plt.figure()
+    
     # 1. Class Distribution Comparison
-    plt.figure(figsize=(12, 6))
+    fig.set_size_inches(12, 6)
     if df_class is not None:
-        plt.subplot(1, 2, 1)
-        sns.countplot(data=df_class, y='class', order=df_class['class'].value_counts().index, palette="viridis")
-        plt.title("Raw Classification Dataset Distribution")
-        plt.xlabel("Count")
+        ax = fig.add_subplot(1, 2, 1)
+        sns.countplot(data=df_class, y='class', order=df_class['class'].value_counts().index, palette="viridis", ax=ax)
+        ax.set_title("Raw Classification Dataset Distribution")
+        ax.set_xlabel("Count")
         
     if df_yolo_bbox is not None:
-        plt.subplot(1, 2, 2)
-        sns.countplot(data=df_yolo_bbox, y='class_name', order=df_yolo_bbox['class_name'].value_counts().index, palette="magma")
-        plt.title("YOLO Bounding Box Class Distribution")
-        plt.xlabel("Count")
+        ax = fig.add_subplot(1, 2, 2)
+        sns.countplot(data=df_yolo_bbox, y='class_name', order=df_yolo_bbox['class_name'].value_counts().index, palette="magma", ax=ax)
+        ax.set_title("YOLO Bounding Box Class Distribution")
+        ax.set_xlabel("Count")
         
-    plt.tight_layout()
-    plt.savefig(output_dir / "class_distribution.png", dpi=300)
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(output_dir / "class_distribution.png", dpi=300)
     
     # 2. Bounding Box Sizes (Relative to Image)
     if df_yolo_bbox is not None:
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(data=df_yolo_bbox, x='width', y='height', hue='class_name', alpha=0.3, s=10)
-        plt.title("Bounding Box Dimensions (Normalized)")
-        plt.xlabel("Width")
-        plt.ylabel("Height")
-        plt.xlim(0, 1)
-        plt.ylim(0, 1)
-        plt.savefig(output_dir / "bbox_dimensions.png", dpi=300)
-        plt.close()
+        fig.clf()
+        fig.set_size_inches(10, 6)
+        ax = fig.add_subplot()
+        # Binned density instead of one marker per box; log counts keep
+        # the sparse large boxes visible
+        hb = ax.hexbin(df_yolo_bbox['width'], df_yolo_bbox['height'], gridsize=80, bins='log',
+                       cmap='viridis', extent=(0, 1, 0, 1), mincnt=1, rasterized=True)
+        fig.colorbar(hb, ax=ax, label="Boxes per bin (log scale)")
+        ax.set_title("Bounding Box Dimensions (Normalized)")
+        ax.set_xlabel("Width")
+        ax.set_ylabel("Height")
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        fig.savefig(output_dir / "bbox_dimensions.png", dpi=300)
         
         # 3. Object Location Heatmap (Centroids)
-        plt.figure(figsize=(8, 8))
-        sns.kdeplot(data=df_yolo_bbox, x='x_center', y='y_center', fill=True, cmap="rocket", thresh=0.05, levels=100)
-        plt.title("Object Centroid Distribution (Heatmap)")
-        plt.xlim(0, 1)
-        plt.ylim(1, 0) # Flip Y axis for image coords
-        plt.savefig(output_dir / "bbox_heatmap.png", dpi=300)
-        plt.close()
+        # KDE cost grows with the point count; a sample gives the same density
+        fig.clf()
+        fig.set_size_inches(8, 8)
+        ax = fig.add_subplot()
+        centroids = df_yolo_bbox[['x_center', 'y_center']]
+        if len(centroids) > KDE_MAX_POINTS:
+            centroids = centroids.sample(n=KDE_MAX_POINTS, random_state=0)
+        sns.kdeplot(data=centroids, x='x_center', y='y_center', fill=True, cmap="rocket", thresh=0.05, levels=100, ax=ax)
+        ax.set_title("Object Centroid Distribution (Heatmap)")
+        ax.set_xlim(0, 1)
+        ax.set_ylim(1, 0) # Flip Y axis for image coords
+        fig.savefig(output_dir / "bbox_heatmap.png", dpi=300)
 
     # 4. Image Aspect Ratios
     if df_yolo_img is not None:
-        plt.figure(figsize=(10, 5))
-        sns.histplot(df_yolo_img['aspect_ratio'], bins=30, kde=True, color='teal')
-        plt.title("Image Aspect Ratio Distribution")
-        plt.xlabel("Width / Height")
-        plt.savefig(output_dir / "image_aspect_ratios.png", dpi=300)
-        plt.close()
+        fig.clf()
+        fig.set_size_inches(10, 5)
+        ax = fig.add_subplot()
+        sns.histplot(df_yolo_img['aspect_ratio'], bins=30, kde=True, color='teal', ax=ax)
+        ax.set_title("Image Aspect Ratio Distribution")
+        ax.set_xlabel("Width / Height")
+        fig.savefig(output_dir / "image_aspect_ratios.png", dpi=300)
+    
+    plt.close(fig)
 
 def main():
     root_dir = Path("/Users/caoduong22102004gmail.com/waste-classification-vn")
@@ -180,19 +292,32 @@ def main():
     # Visualize
     generate_visualizations(df_class, df_yolo_bbox, df_yolo_img, output_dir)
     
-    # Save statistics summarize
+    # Save statistics summarize (one groupby / agg pass per frame)
+    class_counts = {}
+    if df_class is not None:
+        class_counts = df_class.groupby('class', sort=False).size().sort_values(ascending=False).to_dict()
+    
+    bbox_counts, avg_bbox_area = {}, 0
+    if df_yolo_bbox is not None:
+        bbox_counts = df_yolo_bbox.groupby('class_name', sort=False).size().sort_values(ascending=False).to_dict()
+        avg_bbox_area = float(df_yolo_bbox['area'].mean())
+    
+    img_means = {'width': 0, 'height': 0}
+    if df_yolo_img is not None:
+        img_means = df_yolo_img.agg({'width': 'mean', 'height': 'mean'}).to_dict()
+    
     stats = {
         "classification_dataset": {
             "total_images": len(df_class) if df_class is not None else 0,
-            "classes": df_class['class'].value_counts().to_dict() if df_class is not None else {}
+            "classes": class_counts
         },
         "yolo_dataset": {
             "total_bboxes": len(df_yolo_bbox) if df_yolo_bbox is not None else 0,
             "total_images": len(df_yolo_img) if df_yolo_img is not None else 0,
-            "class_distribution": df_yolo_bbox['class_name'].value_counts().to_dict() if df_yolo_bbox is not None else {},
-            "avg_img_width": float(df_yolo_img['width'].mean()) if df_yolo_img is not None else 0,
-            "avg_img_height": float(df_yolo_img['height'].mean()) if df_yolo_img is not None else 0,
-            "avg_bbox_area": float(df_yolo_bbox['area'].mean()) if df_yolo_bbox is not None else 0
+            "class_distribution": bbox_counts,
+            "avg_img_width": float(img_means['width']),
+            "avg_img_height": float(img_means['height']),
+            "avg_bbox_area": avg_bbox_area
         }
     }
     
@@ -6,15 +6,27 @@ Setup augmentation strategy with differential augmentation based on class size.
 Uses albumentations library for efficient augmentations.
 """
 
-import json
+import os
+import random
+import threading
+from functools import lru_cache
 import cv2
 import numpy as np
 from pathlib import Path
 import albumentations as A
-from albumentations.pytorch import ToTensorV2
 import matplotlib.pyplot as plt
 from PIL import Image
 
+from file_manifest import IMAGE_EXTENSIONS
+from json_utils import dump_json, load_json
+
+# PyTurboJPEG (optional): decodes JPEGs straight to RGB; cv2 otherwise
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    TURBO_JPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    TURBO_JPEG = None
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -26,10 +38,153 @@ print("="*70)
 # Image size for training
 IMG_SIZE = 224
 
+# ImageNet normalization, shared by every pipeline and the saved config
+NORM_MEAN = (0.485, 0.456, 0.406)
+NORM_STD = (0.229, 0.224, 0.225)
+
+# ============================================================================
+# FUSED AFFINE + RESIZE
+# ============================================================================
+
+_scratch = threading.local()
+
+
+def _scratch_buffer(key, shape, dtype=np.uint8):
+    """Per-thread reusable array for intermediates that never leave a call"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    buf = buffers.get(key)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = buffers[key] = np.empty(shape, dtype=dtype)
+    return buf
+
+
+def _pixel_scale(sx, sy):
+    """3x3 matrix scaling pixel-center coordinates (cv2.resize convention)"""
+    return np.array([
+        [sx, 0.0, 0.5 * sx - 0.5],
+        [0.0, sy, 0.5 * sy - 0.5],
+        [0.0, 0.0, 1.0]
+    ])
+
+
+class AffineResize(A.ImageOnlyTransform):
+    """
+    Random shift/scale/rotate followed by the resize to `size`, done as one
+    cv2.warpAffine straight into the size x size output
+    
+    Replaces an A.Affine / A.Rotate (full-resolution warp + buffer) followed by
+    A.Resize. Large downscales are first shrunk with INTER_AREA into a reused
+    per-thread buffer (to at most 2x the output) so the warp does not alias.
+    The resize always happens; `affine_p` is the chance of the random warp.
+    """
+    
+    def __init__(
+        self,
+        size=IMG_SIZE,
+        scale=(1.0, 1.0),
+        translate_percent=(0.0, 0.0),
+        rotate=(0.0, 0.0),
+        affine_p=1.0,
+        border_mode=cv2.BORDER_REFLECT_101,
+        always_apply=True,
+        p=1.0
+    ):
+        super().__init__(always_apply=always_apply, p=p)
+        self.size = size
+        self.scale = scale
+        self.translate_percent = translate_percent
+        self.rotate = rotate
+        self.affine_p = affine_p
+        self.border_mode = border_mode
+    
+    def get_params(self):
+        if random.random() >= self.affine_p:
+            return {'angle': 0.0, 'zoom': 1.0, 'tx': 0.0, 'ty': 0.0}
+        return {
+            'angle': random.uniform(*self.rotate),
+            'zoom': random.uniform(*self.scale),
+            'tx': random.uniform(*self.translate_percent),
+            'ty': random.uniform(*self.translate_percent),
+        }
+    
+    def apply(self, img, angle=0.0, zoom=1.0, tx=0.0, ty=0.0, **params):
+        h, w = img.shape[:2]
+        
+        # Shift/scale/rotate about the image center, in source pixels
+        warp = np.eye(3)
+        warp[:2] = cv2.getRotationMatrix2D(((w - 1) / 2, (h - 1) / 2), angle, zoom)
+        warp[0, 2] += tx * w
+        warp[1, 2] += ty * h
+        matrix = _pixel_scale(self.size / w, self.size / h) @ warp
+        
+        # Anti-alias big downscales before the (bilinear) warp
+        shrink = min(w, h) / (2 * self.size)
+        if shrink > 1.0:
+            sw, sh = max(1, round(w / shrink)), max(1, round(h / shrink))
+            src = _scratch_buffer('shrink', (sh, sw) + img.shape[2:])
+            cv2.resize(img, (sw, sh), dst=src, interpolation=cv2.INTER_AREA)
+            matrix = matrix @ _pixel_scale(w / sw, h / sh)
+            img = src
+        
+        # Fresh output: it is handed back to the caller / DataLoader
+        return cv2.warpAffine(
+            img, matrix[:2], (self.size, self.size),
+            flags=cv2.INTER_LINEAR, borderMode=self.border_mode
+        )
+    
+    def get_transform_init_args_names(self):
+        return ('size', 'scale', 'translate_percent', 'rotate', 'affine_p', 'border_mode')
+
+
+class UInt8GaussNoise(A.ImageOnlyTransform):
+    """
+    Additive Gaussian noise that stays in uint8
+    
+    A.GaussNoise and A.ISONoise build float32 copies of the full image; here
+    the noise is drawn into a reused int16 buffer and added with saturation
+    by cv2.add. `per_channel=False` adds the same grain to every channel
+    (luminance-only, sensor-like noise in place of ISONoise).
+    """
+    
+    def __init__(self, var_limit=(10.0, 50.0), per_channel=True, always_apply=False, p=0.5):
+        super().__init__(always_apply=always_apply, p=p)
+        self.var_limit = var_limit
+        self.per_channel = per_channel
+    
+    def get_params(self):
+        # Seed cv2's RNG from the albumentations (python) RNG so DataLoader
+        # workers, which are seeded separately, do not share noise
+        return {
+            'sigma': random.uniform(*self.var_limit) ** 0.5,
+            'seed': random.getrandbits(31)
+        }
+    
+    def apply(self, img, sigma=5.0, seed=0, **params):
+        cv2.setRNGSeed(seed)
+        if self.per_channel or img.ndim == 2:
+            noise = _scratch_buffer('noise', img.shape, np.int16)
+            channels = 1 if img.ndim == 2 else img.shape[2]
+            cv2.randn(noise, (0.0,) * channels, (sigma,) * channels)
+        else:
+            grain = _scratch_buffer('grain', img.shape[:2], np.int16)
+            cv2.randn(grain, 0.0, sigma)
+            noise = cv2.merge((grain,) * img.shape[2])
+        return cv2.add(img, noise, dtype=cv2.CV_8U)
+    
+    def get_transform_init_args_names(self):
+        return ('var_limit', 'per_channel')
+
+
 # ============================================================================
 # AUGMENTATION STRATEGIES
 # ============================================================================
+# Each getter builds its Compose once per process and returns the shared
+# instance afterwards. Albumentations draws from the global RNG at call time,
+# so reusing one pipeline across samples is safe.
 
+@lru_cache(maxsize=1)
 def get_light_augmentation():
     """
     Light augmentation for large classes (e.g., textile)
@@ -38,7 +193,6 @@ def get_light_augmentation():
     return A.Compose([
         # Geometric
         A.HorizontalFlip(p=0.5),
-        A.Rotate(limit=15, p=0.3),
         
         # Color
         A.RandomBrightnessContrast(
@@ -47,13 +201,13 @@ def get_light_augmentation():
             p=0.3
         ),
         
-        # Resize and normalize
-        A.Resize(IMG_SIZE, IMG_SIZE),
-        A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ToTensorV2()
+        # Rotate + resize in one warp (normalization runs on the collated
+        # batch, see get_gpu_normalize)
+        AffineResize(IMG_SIZE, rotate=(-15, 15), affine_p=0.3)
     ])
 
 
+@lru_cache(maxsize=1)
 def get_medium_augmentation():
     """
     Medium augmentation for medium-sized classes
@@ -61,13 +215,6 @@ def get_medium_augmentation():
     return A.Compose([
         # Geometric
         A.HorizontalFlip(p=0.5),
-        A.Rotate(limit=20, p=0.5),
-        A.ShiftScaleRotate(
-            shift_limit=0.1,
-            scale_limit=0.1,
-            rotate_limit=20,
-            p=0.5
-        ),
         
         # Color
         A.RandomBrightnessContrast(
@@ -84,15 +231,21 @@ def get_medium_augmentation():
         
         # Quality degradation
         A.GaussianBlur(blur_limit=(3, 5), p=0.2),
-        A.ISONoise(p=0.2),
+        UInt8GaussNoise(var_limit=(10.0, 50.0), per_channel=False, p=0.2),
         
-        # Resize and normalize
-        A.Resize(IMG_SIZE, IMG_SIZE),
-        A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ToTensorV2()
+        # Shift/scale/rotate + resize in one warp (normalization runs on the
+        # collated batch, see get_gpu_normalize)
+        AffineResize(
+            IMG_SIZE,
+            scale=(0.9, 1.1),
+            translate_percent=(-0.1, 0.1),
+            rotate=(-20, 20),
+            affine_p=0.75
+        )
     ])
 
 
+@lru_cache(maxsize=1)
 def get_heavy_augmentation():
     """
     Heavy augmentation for small classes (e.g., trash, brown-glass)
@@ -102,13 +255,6 @@ def get_heavy_augmentation():
         # Geometric
         A.HorizontalFlip(p=0.5),
         A.VerticalFlip(p=0.2),
-        A.Rotate(limit=30, p=0.7),
-        A.ShiftScaleRotate(
-            shift_limit=0.15,
-            scale_limit=0.15,
-            rotate_limit=30,
-            p=0.7
-        ),
         A.Perspective(scale=(0.05, 0.1), p=0.3),
         
         # Color
@@ -137,8 +283,8 @@ def get_heavy_augmentation():
         ], p=0.3),
         
         A.OneOf([
-            A.ISONoise(p=1.0),
-            A.GaussNoise(var_limit=(10, 50), p=1.0),
+            UInt8GaussNoise(var_limit=(10.0, 50.0), per_channel=False, p=1.0),
+            UInt8GaussNoise(var_limit=(10.0, 50.0), per_channel=True, p=1.0),
         ], p=0.3),
         
         A.Downscale(scale_min=0.7, scale_max=0.9, p=0.2),
@@ -147,25 +293,53 @@ def get_heavy_augmentation():
         A.RandomShadow(p=0.2),
         A.RandomFog(fog_coef_lower=0.1, fog_coef_upper=0.3, p=0.1),
         
-        # Resize and normalize
-        A.Resize(IMG_SIZE, IMG_SIZE),
-        A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ToTensorV2()
+        # Shift/scale/rotate + resize in one warp (normalization runs on the
+        # collated batch, see get_gpu_normalize)
+        AffineResize(
+            IMG_SIZE,
+            scale=(0.85, 1.15),
+            translate_percent=(-0.15, 0.15),
+            rotate=(-30, 30),
+            affine_p=0.9
+        )
     ])
 
 
+@lru_cache(maxsize=1)
 def get_validation_transform():
     """
     No augmentation for validation/test sets
-    Only resize and normalize
+    Only resize; normalize on the batch with get_gpu_normalize
     """
     return A.Compose([
-        A.Resize(IMG_SIZE, IMG_SIZE),
-        A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ToTensorV2()
+        A.Resize(IMG_SIZE, IMG_SIZE, interpolation=cv2.INTER_AREA)
     ])
 
 
+def get_gpu_normalize():
+    """
+    Normalization for a collated batch of pipeline outputs
+    The pipelines above stop at uint8 HWC; collate them into a (B, H, W, C)
+    uint8 tensor, move it to the device, then apply this module to get the
+    normalized float (B, C, H, W) batch in channels_last memory format.
+    Move the module with .to(device) once so the mean/std buffers live there
+    """
+    import torch
+
+    class GPUNormalize(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.register_buffer('mean', torch.tensor(NORM_MEAN).view(1, 3, 1, 1) * 255.0)
+            self.register_buffer('std', torch.tensor(NORM_STD).view(1, 3, 1, 1) * 255.0)
+
+        def forward(self, x):
+            # NHWC -> NCHW view; .float() keeps the NHWC strides (channels_last)
+            x = x.permute(0, 3, 1, 2).float()
+            return x.sub_(self.mean).div_(self.std).contiguous(memory_format=torch.channels_last)
+
+    return GPUNormalize()
+
+
 # ============================================================================
 # AUGMENTATION STRATEGY MAPPER
 # ============================================================================
@@ -182,8 +356,6 @@ def determine_augmentation_strategy(class_counts):
     """
     print("\n Determining augmentation strategy per class...")
     
-    strategy_map = {}
-    
     # Thresholds
     LARGE_THRESHOLD = 2000
     MEDIUM_THRESHOLD = 800
@@ -191,15 +363,14 @@ def determine_augmentation_strategy(class_counts):
     print(f"\n{'Class':<15s} {'Samples':>10s} {'Strategy':>15s}")
     print("-" * 70)
     
-    for class_name, count in sorted(class_counts.items(), key=lambda x: x[1], reverse=True):
-        if count > LARGE_THRESHOLD:
-            strategy = 'light'
-        elif count > MEDIUM_THRESHOLD:
-            strategy = 'medium'
-        else:
-            strategy = 'heavy'
-        
-        strategy_map[class_name] = strategy
+    # Bucket all counts at once: (.., 800] heavy, (800, 2000] medium, (2000, ..) light
+    class_names = sorted(class_counts, key=class_counts.get, reverse=True)
+    counts = np.fromiter((class_counts[name] for name in class_names), dtype=np.int64, count=len(class_names))
+    buckets = np.digitize(counts, [MEDIUM_THRESHOLD, LARGE_THRESHOLD], right=True)
+    strategies = np.array(['heavy', 'medium', 'light'])[buckets].tolist()
+    strategy_map = dict(zip(class_names, strategies))
+    
+    for class_name, count, strategy in zip(class_names, counts.tolist(), strategies):
         print(f"{class_name:<15s} {count:>10,} {strategy:>15s}")
     
     return strategy_map
@@ -209,6 +380,21 @@ def determine_augmentation_strategy(class_counts):
 # VISUALIZATION
 # ============================================================================
 
+def read_image_rgb(image_path):
+    """
+    Read an image as an RGB array (libjpeg-turbo for JPEGs when available)
+    """
+    if TURBO_JPEG is not None and Path(image_path).suffix.lower() in ('.jpg', '.jpeg'):
+        with open(image_path, 'rb') as f:
+            try:
+                return TURBO_JPEG.decode(f.read(), pixel_format=TJPF_RGB)
+            except OSError:
+                pass  # Malformed or unusual JPEG: let OpenCV try
+    
+    image = cv2.imread(str(image_path))
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
 def visualize_augmentations(image_path, output_dir):
     """
     Visualize different augmentation strategies on a sample image
@@ -216,35 +402,13 @@ def visualize_augmentations(image_path, output_dir):
     print(f"\n Creating augmentation visualizations...")
     
     # Read image
-    image = cv2.imread(str(image_path))
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
-    # Get transforms (without normalization for visualization)
-    light_aug = A.Compose([
-        A.HorizontalFlip(p=1.0),
-        A.Rotate(limit=15, p=1.0),
-        A.RandomBrightnessContrast(brightness_limit=0.1, contrast_limit=0.1, p=1.0),
-        A.Resize(IMG_SIZE, IMG_SIZE)
-    ])
-    
-    medium_aug = A.Compose([
-        A.HorizontalFlip(p=1.0),
-        A.Rotate(limit=20, p=1.0),
-        A.RandomBrightnessContrast(brightness_limit=0.2, contrast_limit=0.2, p=1.0),
-        A.HueSaturationValue(hue_shift_limit=10, sat_shift_limit=20, val_shift_limit=10, p=1.0),
-        A.GaussianBlur(blur_limit=(3, 5), p=1.0),
-        A.Resize(IMG_SIZE, IMG_SIZE)
-    ])
+    image = read_image_rgb(image_path)
     
-    heavy_aug = A.Compose([
-        A.HorizontalFlip(p=1.0),
-        A.Rotate(limit=30, p=1.0),
-        A.ShiftScaleRotate(shift_limit=0.15, scale_limit=0.15, rotate_limit=30, p=1.0),
-        A.RandomBrightnessContrast(brightness_limit=0.3, contrast_limit=0.3, p=1.0),
-        A.HueSaturationValue(hue_shift_limit=20, sat_shift_limit=30, val_shift_limit=20, p=1.0),
-        A.GaussianBlur(blur_limit=(3, 7), p=1.0),
-        A.Resize(IMG_SIZE, IMG_SIZE)
-    ])
+    # Same cached pipelines as training (they stop at uint8, before
+    # normalization), so the previews are real samples of each strategy
+    light_aug = get_light_augmentation()
+    medium_aug = get_medium_augmentation()
+    heavy_aug = get_heavy_augmentation()
     
     # Create figure
     fig, axes = plt.subplots(2, 4, figsize=(16, 8))
@@ -296,8 +460,8 @@ def save_augmentation_config(strategy_map, output_dir):
     config = {
         'image_size': IMG_SIZE,
         'normalization': {
-            'mean': [0.485, 0.456, 0.406],
-            'std': [0.229, 0.224, 0.225]
+            'mean': list(NORM_MEAN),
+            'std': list(NORM_STD)
         },
         'class_strategies': strategy_map,
         'strategies': {
@@ -313,12 +477,11 @@ def save_augmentation_config(strategy_map, output_dir):
                 'description': 'Medium augmentation for medium classes (800-2000 samples)',
                 'transformations': [
                     'HorizontalFlip (p=0.5)',
-                    'Rotate (±20°, p=0.5)',
-                    'ShiftScaleRotate (p=0.5)',
+                    'Affine (±10% shift/scale, ±20°, p=0.75)',
                     'RandomBrightnessContrast (±20%, p=0.5)',
                     'HueSaturationValue (p=0.3)',
                     'GaussianBlur (p=0.2)',
-                    'ISONoise (p=0.2)'
+                    'Luminance noise (p=0.2)'
                 ]
             },
             'heavy': {
@@ -326,8 +489,7 @@ def save_augmentation_config(strategy_map, output_dir):
                 'transformations': [
                     'HorizontalFlip (p=0.5)',
                     'VerticalFlip (p=0.2)',
-                    'Rotate (±30°, p=0.7)',
-                    'ShiftScaleRotate (p=0.7)',
+                    'Affine (±15% shift/scale, ±30°, p=0.9)',
                     'Perspective (p=0.3)',
                     'RandomBrightnessContrast (±30%, p=0.7)',
                     'HueSaturationValue (p=0.5)',
@@ -343,13 +505,13 @@ def save_augmentation_config(strategy_map, output_dir):
         'usage': {
             'training': 'Apply augmentation based on class strategy',
             'validation': 'No augmentation, only resize and normalize',
-            'testing': 'No augmentation, only resize and normalize'
+            'testing': 'No augmentation, only resize and normalize',
+            'normalization': 'Applied on device to the collated uint8 batch'
         }
     }
     
     output_path = output_dir / 'augmentation_config.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
+    dump_json(config, output_path)
     
     print(f"\n Augmentation config saved to: {output_path}")
 
@@ -358,6 +520,21 @@ def save_augmentation_config(strategy_map, output_dir):
 # MAIN EXECUTION
 # ============================================================================
 
+def find_sample_image(train_dir):
+    """
+    Return the first image found under a class folder of train_dir, or None
+    """
+    with os.scandir(train_dir) as class_entries:
+        for class_entry in class_entries:
+            if class_entry.name.startswith('.') or not class_entry.is_dir():
+                continue
+            with os.scandir(class_entry.path) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                        return Path(entry.path)
+    return None
+
+
 def main():
     """
     Main execution function
@@ -375,8 +552,7 @@ def main():
         return
     
     # Load class counts
-    with open(merge_info_path, 'r') as f:
-        merge_info = json.load(f)
+    merge_info = load_json(merge_info_path)
     
     class_counts = merge_info['statistics']['by_class']
     
@@ -402,14 +578,8 @@ def main():
     print(f"\n Creating visualization...")
     train_dir = data_dir / 'train'
     
-    # Find first image for visualization
-    sample_image = None
-    for class_dir in train_dir.iterdir():
-        if class_dir.is_dir() and not class_dir.name.startswith('.'):
-            images = list(class_dir.glob('*.jpg')) + list(class_dir.glob('*.png'))
-            if images:
-                sample_image = images[0]
-                break
+    # Find first image for visualization (stops at the first match)
+    sample_image = find_sample_image(train_dir)
     
     if sample_image:
         visualize_augmentations(sample_image, output_dir)
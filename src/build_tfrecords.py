@@ -0,0 +1,155 @@
+"""
+TFRECORD SHARD BUILDER
+======================
+Decode and resize the processed train/val/test images once and store them
+as sharded TFRecords of raw IMG_SIZE×IMG_SIZE×3 uint8 tensors. Training
+epochs then only parse records instead of decoding JPEG/PNG files.
+
+Output (data/processed/tfrecords/):
+- {split}-000.tfrecord, {split}-001.tfrecord, ... (~SHARD_SIZE_MB each)
+- tfrecord_info.json: class indices plus per-split shard list, labels and
+  the class directory mtimes the shards were built from (see file_manifest.py)
+"""
+
+import os
+import random
+from pathlib import Path
+from tqdm import tqdm
+import tensorflow as tf
+
+from file_manifest import IMAGE_EXTENSIONS, class_dir_mtimes
+from json_utils import dump_json
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATA_DIR = Path('data/processed')
+OUTPUT_DIR = DATA_DIR / 'tfrecords'
+IMG_SIZE = 224
+SHARD_SIZE_MB = 100
+INFO_NAME = 'tfrecord_info.json'
+
+# Images per shard at the target size (records are raw uint8 tensors)
+IMAGES_PER_SHARD = max(1, (SHARD_SIZE_MB << 20) // (IMG_SIZE * IMG_SIZE * 3))
+
+print("="*70)
+print("TFRECORD SHARD BUILDER")
+print("="*70)
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def list_split_images(split_dir, class_to_idx):
+    """
+    List (path, label) pairs for a split with one scandir pass per class
+    """
+    samples = []
+    for class_name, idx in class_to_idx.items():
+        class_dir = split_dir / class_name
+        if not class_dir.exists():
+            continue
+        with os.scandir(class_dir) as entries:
+            samples.extend(
+                (entry.path, idx) for entry in sorted(entries, key=lambda e: e.name)
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+            )
+    return samples
+
+
+def encode_example(img_path, label):
+    """
+    Decode, resize and serialize one image as a tf.train.Example
+    """
+    image = tf.io.decode_image(tf.io.read_file(img_path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, (IMG_SIZE, IMG_SIZE))
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+
+    feature = {
+        'image_raw': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.numpy().tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[label]))
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+
+def write_split(data_dir, output_dir, split, class_to_idx, shuffle=False, seed=42):
+    """
+    Write one split into shards; returns (shard names, labels in record order)
+    """
+    samples = list_split_images(data_dir / split, class_to_idx)
+    if shuffle:
+        # Mix classes across shards so interleaved reads see every class
+        random.Random(seed).shuffle(samples)
+
+    shard_names = []
+    for shard_idx, start in enumerate(range(0, len(samples), IMAGES_PER_SHARD)):
+        shard_name = f"{split}-{shard_idx:03d}.tfrecord"
+        shard_samples = samples[start:start + IMAGES_PER_SHARD]
+        with tf.io.TFRecordWriter(str(output_dir / shard_name)) as writer:
+            for img_path, label in tqdm(shard_samples, desc=f"  {shard_name}", leave=False):
+                writer.write(encode_example(img_path, label))
+        shard_names.append(shard_name)
+
+    labels = [label for _, label in samples]
+    print(f"   {split:<6s}: {len(samples):>7,} images -> {len(shard_names)} shards")
+    return shard_names, labels
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main():
+    """
+    Main execution function
+    """
+    train_dir = DATA_DIR / 'train'
+    if not train_dir.exists():
+        print(f" ERROR: Training data not found: {train_dir}")
+        print(f"   Please run merge_classes.py first!")
+        return
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Same class order as image_dataset_from_directory (sorted folder names)
+    with os.scandir(train_dir) as entries:
+        classes = sorted(entry.name for entry in entries if entry.is_dir() and not entry.name.startswith('.'))
+    class_to_idx = {name: idx for idx, name in enumerate(classes)}
+
+    print(f"\n Writing shards to: {OUTPUT_DIR}")
+    print(f"   Images per shard: {IMAGES_PER_SHARD}")
+
+    info = {
+        'image_size': IMG_SIZE,
+        'class_indices': class_to_idx,
+        'splits': {}
+    }
+    for split in ['train', 'val', 'test']:
+        if not (DATA_DIR / split).exists():
+            print(f"     {split}/ not found, skipping...")
+            continue
+        # Taken before reading, so changes made during the build mark it stale
+        mtimes = class_dir_mtimes(DATA_DIR / split)
+        shards, labels = write_split(DATA_DIR, OUTPUT_DIR, split, class_to_idx, shuffle=(split == 'train'))
+        info['splits'][split] = {
+            'mtimes': mtimes,
+            'shards': shards,
+            'samples': len(labels),
+            'labels': labels
+        }
+
+    info_path = OUTPUT_DIR / INFO_NAME
+    # Compact: one label per image, not read by humans
+    dump_json(info, info_path, indent=False)
+
+    print("\n" + "="*70)
+    print(" TFRECORD SHARDS READY!")
+    print("="*70)
+    print(f"\n Shard info saved to: {info_path}")
+    print(f" data_generators.py reads the shards while data/processed is unchanged")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
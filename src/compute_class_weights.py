@@ -5,11 +5,13 @@ Calculate class weights to handle imbalanced dataset during training.
 Uses inverse frequency weighting strategy.
 """
 
-import json
 import numpy as np
 from pathlib import Path
 from collections import Counter
 
+from file_manifest import count_images_per_dir, load_split_counts
+from json_utils import dump_json
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -37,29 +39,31 @@ def count_samples_per_class(data_dir, split='train'):
         print(f" ERROR: {split}/ directory not found")
         return None
     
-    class_counts = {}
-    
-    # Get all class directories
-    class_dirs = sorted([d for d in split_dir.iterdir() if d.is_dir()])
+    # Counts recorded by merge_classes.py, if no class directory changed since
+    class_counts = load_split_counts(data_dir, split)
     
-    for class_dir in class_dirs:
-        class_name = class_dir.name
-        
-        # Skip hidden directories
-        if class_name.startswith('.'):
-            continue
-        
-        # Count images
-        n_images = 0
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']:
-            n_images += len(list(class_dir.glob(ext)))
+    if class_counts is None:
+        # Get all class directories (skip hidden directories)
+        class_dirs = sorted([d for d in split_dir.iterdir() if d.is_dir() and not d.name.startswith('.')])
         
-        class_counts[class_name] = n_images
-        print(f"   {class_name:<15s}: {n_images:>6,} images")
+        # Count images, class directories scanned in parallel
+        class_counts = dict(zip((d.name for d in class_dirs), count_images_per_dir(class_dirs)))
+    
+    # One write for the whole table
+    if class_counts:
+        print("\n".join(f"   {class_name:<15s}: {n_images:>6,} images"
+                        for class_name, n_images in class_counts.items()))
     
     return class_counts
 
 
+def _counts_array(class_counts):
+    """
+    Class counts as a float64 array, in the dict's class order
+    """
+    return np.fromiter(class_counts.values(), dtype=np.float64, count=len(class_counts))
+
+
 def calculate_weights_inverse_frequency(class_counts):
     """
     Calculate class weights using inverse frequency method
@@ -70,16 +74,10 @@ def calculate_weights_inverse_frequency(class_counts):
     """
     print("\n Calculating inverse frequency weights...")
     
-    total_samples = sum(class_counts.values())
-    n_classes = len(class_counts)
-    
-    weights = {}
+    counts = _counts_array(class_counts)
+    weights = counts.sum() / (len(counts) * counts)
     
-    for class_name, count in class_counts.items():
-        weight = total_samples / (n_classes * count)
-        weights[class_name] = weight
-    
-    return weights
+    return dict(zip(class_counts, weights.tolist()))
 
 
 def calculate_weights_effective_number(class_counts, beta=0.9999):
@@ -93,18 +91,13 @@ def calculate_weights_effective_number(class_counts, beta=0.9999):
     """
     print(f"\n Calculating effective number weights (beta={beta})...")
     
-    weights = {}
-    
-    for class_name, count in class_counts.items():
-        effective_num = (1.0 - beta) / (1.0 - np.power(beta, count))
-        weights[class_name] = effective_num
+    counts = _counts_array(class_counts)
+    weights = (1.0 - beta) / (1.0 - np.power(beta, counts))
     
     # Normalize weights
-    total_weight = sum(weights.values())
-    for class_name in weights:
-        weights[class_name] = weights[class_name] / total_weight * len(weights)
+    weights *= len(weights) / weights.sum()
     
-    return weights
+    return dict(zip(class_counts, weights.tolist()))
 
 
 def calculate_weights_sqrt(class_counts):
@@ -117,34 +110,27 @@ def calculate_weights_sqrt(class_counts):
     """
     print("\n Calculating square root weights...")
     
-    counts = np.array(list(class_counts.values()))
-    median_count = np.median(counts)
+    counts = _counts_array(class_counts)
+    weights = np.sqrt(np.median(counts) / counts)
     
-    weights = {}
-    
-    for class_name, count in class_counts.items():
-        weight = np.sqrt(median_count / count)
-        weights[class_name] = weight
-    
-    return weights
+    return dict(zip(class_counts, weights.tolist()))
 
 
 def normalize_weights(weights):
     """
     Normalize weights so minimum weight is 1.0
     """
-    min_weight = min(weights.values())
-    
-    normalized = {}
-    for class_name, weight in weights.items():
-        normalized[class_name] = weight / min_weight
+    values = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    values /= values.min()
     
-    return normalized
+    return dict(zip(weights, values.tolist()))
 
 
-def display_weights(weights, class_counts, title="Class Weights"):
+def display_weights(weights, class_counts, title="Class Weights", normalized=None):
     """
     Display calculated weights in a formatted table
+    
+    normalized: precomputed normalize_weights(weights), computed if omitted
     """
     print(f"\n{'='*70}")
     print(f"{title}")
@@ -156,14 +142,16 @@ def display_weights(weights, class_counts, title="Class Weights"):
     sorted_weights = sorted(weights.items(), key=lambda x: x[1], reverse=True)
     
     # Normalize
-    normalized = normalize_weights(weights)
-    
-    for class_name, weight in sorted_weights:
-        count = class_counts[class_name]
-        norm_weight = normalized[class_name]
-        print(f"{class_name:<15s} {count:>10,} {weight:>12.4f} {norm_weight:>12.2f}×")
-    
-    print("-" * 70)
+    if normalized is None:
+        normalized = normalize_weights(weights)
+    
+    # Rows are collected and written at once
+    rows = [
+        f"{class_name:<15s} {class_counts[class_name]:>10,} {weight:>12.4f} {normalized[class_name]:>12.2f}×"
+        for class_name, weight in sorted_weights
+    ]
+    rows.append("-" * 70)
+    print("\n".join(rows))
     print(f"\n Interpretation:")
     print(f"   - Higher weight = Minority class (model will focus more)")
     print(f"   - Lower weight = Majority class (model will focus less)")
@@ -173,24 +161,26 @@ def display_weights(weights, class_counts, title="Class Weights"):
 def convert_to_keras_format(weights, class_to_idx):
     """
     Convert class weights to Keras format: {class_idx: weight}
-    """
-    keras_weights = {}
     
-    for class_name, weight in weights.items():
-        idx = class_to_idx[class_name]
-        keras_weights[idx] = float(weight)
-    
-    return keras_weights
+    The calculate_weights_* functions already return plain Python floats.
+    """
+    return {class_to_idx[class_name]: weight for class_name, weight in weights.items()}
 
 
-def save_weights(weights, class_counts, output_dir):
+def save_weights(weights, class_counts, output_dir, normalized=None):
     """
     Save calculated weights to JSON file
+    
+    normalized: {method: normalize_weights(weights[method])}, computed if omitted
     """
-    # Create class to index mapping (sorted alphabetically)
-    classes = sorted(class_counts.keys())
-    class_to_idx = {name: idx for idx, name in enumerate(classes)}
-    idx_to_class = {idx: name for name, idx in class_to_idx.items()}
+    if normalized is None:
+        normalized = {method: normalize_weights(w) for method, w in weights.items()}
+    
+    # Create class to index mapping (sorted alphabetically; count_samples_per_class
+    # already returns classes in that order, for which sorted() is one linear pass)
+    classes = sorted(class_counts)
+    idx_to_class = dict(enumerate(classes))
+    class_to_idx = {name: idx for idx, name in idx_to_class.items()}
     
     # Convert to different formats
     inverse_freq_keras = convert_to_keras_format(weights['inverse_frequency'], class_to_idx)
@@ -208,19 +198,19 @@ def save_weights(weights, class_counts, output_dir):
                 'description': 'Inverse frequency weighting: weight_i = total / (n_classes * count_i)',
                 'class_weights': weights['inverse_frequency'],
                 'keras_format': inverse_freq_keras,
-                'normalized': normalize_weights(weights['inverse_frequency'])
+                'normalized': normalized['inverse_frequency']
             },
             'effective_number': {
                 'description': 'Effective number of samples: weight_i = (1-beta) / (1-beta^n_i), beta=0.9999',
                 'class_weights': weights['effective_number'],
                 'keras_format': effective_num_keras,
-                'normalized': normalize_weights(weights['effective_number'])
+                'normalized': normalized['effective_number']
             },
             'sqrt': {
                 'description': 'Square root weighting: weight_i = sqrt(median / count_i)',
                 'class_weights': weights['sqrt'],
                 'keras_format': sqrt_keras,
-                'normalized': normalize_weights(weights['sqrt'])
+                'normalized': normalized['sqrt']
             }
         },
         'recommendation': {
@@ -231,8 +221,7 @@ def save_weights(weights, class_counts, output_dir):
     
     # Save to file
     output_path = output_dir / 'class_weights.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    dump_json(output, output_path)
     
     print(f"\n Class weights saved to: {output_path}")
     
@@ -243,8 +232,7 @@ def save_weights(weights, class_counts, output_dir):
     }
     
     simple_path = output_dir / 'class_weights_simple.json'
-    with open(simple_path, 'w', encoding='utf-8') as f:
-        json.dump(simple_output, f, indent=2)
+    dump_json(simple_output, simple_path)
     
     print(f" Simple weights saved to: {simple_path}")
 
@@ -269,26 +257,33 @@ def main():
     if class_counts is None:
         return
     
-    # Calculate weights using different methods
+    # Calculate weights using different methods (normalized once per method)
     weights = {}
+    normalized = {}
     
     # Method 1: Inverse frequency (recommended)
     weights['inverse_frequency'] = calculate_weights_inverse_frequency(class_counts)
+    normalized['inverse_frequency'] = normalize_weights(weights['inverse_frequency'])
     display_weights(weights['inverse_frequency'], class_counts, 
-                   "Method 1: Inverse Frequency Weighting (RECOMMENDED)")
+                   "Method 1: Inverse Frequency Weighting (RECOMMENDED)",
+                   normalized['inverse_frequency'])
     
     # Method 2: Effective number
     weights['effective_number'] = calculate_weights_effective_number(class_counts, beta=0.9999)
+    normalized['effective_number'] = normalize_weights(weights['effective_number'])
     display_weights(weights['effective_number'], class_counts,
-                   "Method 2: Effective Number of Samples")
+                   "Method 2: Effective Number of Samples",
+                   normalized['effective_number'])
     
     # Method 3: Square root
     weights['sqrt'] = calculate_weights_sqrt(class_counts)
+    normalized['sqrt'] = normalize_weights(weights['sqrt'])
     display_weights(weights['sqrt'], class_counts,
-                   "Method 3: Square Root Weighting")
+                   "Method 3: Square Root Weighting",
+                   normalized['sqrt'])
     
     # Save weights
-    save_weights(weights, class_counts, OUTPUT_DIR)
+    save_weights(weights, class_counts, OUTPUT_DIR, normalized)
     
     # Final summary
     print("\n" + "="*70)
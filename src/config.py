@@ -1,26 +1,47 @@
 # src/config.py
 
+import os
 import yaml
+from functools import lru_cache, reduce
 from pathlib import Path
 
+# libyaml's C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+@lru_cache(maxsize=8)
+def _load(config_path, mtime_ns):
+    """Parse a config file once per (path, mtime); the dict is shared"""
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+def _getitem(value, key):
+    """One step of Config.get; strings are leaves, not sequences to index"""
+    if isinstance(value, str):
+        raise TypeError(key)
+    return value[key]
+
+
 class Config:
     """Load and manage configuration"""
     
     def __init__(self, config_path='config.yaml'):
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        # Re-parsed only when the file changes; treat self.config as read-only
+        self.config = _load(str(config_path), os.stat(config_path).st_mtime_ns)
     
     def __getitem__(self, key):
         return self.config[key]
     
     def get(self, *keys, default=None):
         """Get nested config values"""
-        value = self.config
-        for key in keys:
-            if isinstance(value, dict):
-                value = value.get(key)
-            else:
-                return default
+        try:
+            value = reduce(_getitem, keys, self.config)
+        except (KeyError, TypeError, IndexError):
+            return default
         return value if value is not None else default
 
 # Usage example
@@ -1,18 +1,23 @@
 """
 DATA GENERATORS FOR TRAINING
 =============================
-Create TensorFlow/Keras data generators with:
+Create tf.data input pipelines with:
 - Differential augmentation per class
 - Class weights integration
 - Train/Val/Test generators
+
+Images are decoded and augmented in parallel tf.data map calls and
+prefetched, so input preparation overlaps with the training step.
 """
 
-import json
+import math
 import numpy as np
 from pathlib import Path
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 import tensorflow as tf
 
+from file_manifest import class_dir_mtimes
+from json_utils import dump_json, load_json
+
 # Suppress TensorFlow warnings
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -28,6 +33,24 @@ print("="*70)
 DATA_DIR = Path('data/processed')
 IMG_SIZE = 224
 BATCH_SIZE = 32
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Pre-decoded shards written by build_tfrecords.py (used when present)
+TFRECORD_SUBDIR = 'tfrecords'
+TFRECORD_INFO = 'tfrecord_info.json'
+SHUFFLE_BUFFER = 4096
+SHARD_READ_BUFFER = 8 << 20
+SHARD_CYCLE_LENGTH = 8
+
+# Training augmentation parameters (also written to generator_config.json)
+AUGMENTATION = {
+    'rotation_range': 20,
+    'width_shift_range': 0.2,
+    'height_shift_range': 0.2,
+    'zoom_range': 0.2,
+    'horizontal_flip': True,
+    'brightness_range': [0.8, 1.2]
+}
 
 # ============================================================================
 # LOAD CONFIGURATIONS
@@ -39,14 +62,12 @@ def load_configs(data_dir):
     
     # Load augmentation config
     aug_config_path = data_dir / 'augmentation_config.json'
-    with open(aug_config_path, 'r') as f:
-        aug_config = json.load(f)
+    aug_config = load_json(aug_config_path)
     print(f" Loaded augmentation config: {aug_config_path}")
     
     # Load class weights
     weights_path = data_dir / 'class_weights_simple.json'
-    with open(weights_path, 'r') as f:
-        weights_data = json.load(f)
+    weights_data = load_json(weights_path)
     print(f" Loaded class weights: {weights_path}")
     
     return aug_config, weights_data
@@ -56,37 +77,175 @@ def load_configs(data_dir):
 # CREATE GENERATORS
 # ============================================================================
 
+def build_augmentation_layers(seed=42):
+    """
+    Keras preprocessing layers for the training augmentation
+    
+    Operates on float images in [0, 255]; rotation is given in degrees in
+    AUGMENTATION and as a fraction of a full turn to RandomRotation.
+    Each layer gets its own seed (seed, seed + 1, ...) so their random
+    draws are not correlated.
+    """
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip('horizontal', seed=seed),
+        tf.keras.layers.RandomRotation(AUGMENTATION['rotation_range'] / 360, fill_mode='nearest', seed=seed + 1),
+        tf.keras.layers.RandomTranslation(
+            AUGMENTATION['height_shift_range'], AUGMENTATION['width_shift_range'],
+            fill_mode='nearest', seed=seed + 2
+        ),
+        tf.keras.layers.RandomZoom(AUGMENTATION['zoom_range'], fill_mode='nearest', seed=seed + 3),
+    ], name='augmentation')
+
+
+def _random_brightness(images, seed=42):
+    """
+    Scale each image of a batch by a factor drawn from brightness_range
+    """
+    lower, upper = AUGMENTATION['brightness_range']
+    factors = tf.random.uniform([tf.shape(images)[0], 1, 1, 1], lower, upper, seed=seed)
+    return tf.clip_by_value(images * factors, 0.0, 255.0)
+
+
+def load_split_dataset(data_dir, split, batch_size=32, shuffle=False, seed=42):
+    """
+    Batched (image, one-hot label) dataset decoded from a split directory
+    
+    Returns (dataset, class_indices, labels) where labels holds the class
+    index of every file.
+    """
+    dataset = tf.keras.utils.image_dataset_from_directory(
+        str(Path(data_dir) / split),
+        labels='inferred',
+        label_mode='categorical',
+        image_size=(IMG_SIZE, IMG_SIZE),
+        batch_size=batch_size,
+        shuffle=shuffle,
+        seed=seed
+    )
+    class_indices = {name: idx for idx, name in enumerate(dataset.class_names)}
+    labels = np.fromiter(
+        (class_indices[Path(path).parent.name] for path in dataset.file_paths),
+        dtype=np.int64, count=len(dataset.file_paths)
+    )
+    return dataset, class_indices, labels
+
+
+def load_tfrecord_dataset(tfrecord_dir, split, batch_size=32, shuffle=False, seed=42, info=None):
+    """
+    Batched (image, one-hot label) dataset parsed from pre-decoded shards
+    
+    Returns (dataset, class_indices, labels) like load_split_dataset; the
+    labels come from tfrecord_info.json in record order (pass info if it is
+    already loaded).
+    """
+    if info is None:
+        info = load_json(tfrecord_dir / TFRECORD_INFO)
+    split_info = info['splits'][split]
+    class_indices = info['class_indices']
+    labels = np.asarray(split_info['labels'], dtype=np.int64)
+    num_classes = len(class_indices)
+    image_size = info['image_size']
+    
+    features = {
+        'image_raw': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.FixedLenFeature([], tf.int64)
+    }
+    
+    def parse_batch(records):
+        # One vectorized parse + decode per batch instead of per record
+        parsed = tf.io.parse_example(records, features)
+        images = tf.io.decode_raw(parsed['image_raw'], tf.uint8)
+        images = tf.reshape(images, [-1, image_size, image_size, 3])
+        return tf.cast(images, tf.float32), tf.one_hot(parsed['label'], num_classes)
+    
+    shards = [str(tfrecord_dir / name) for name in split_info['shards']]
+    if shuffle:
+        # Shard order is reshuffled every epoch; each shard is streamed
+        # sequentially and several are interleaved, so reads stay large
+        files = tf.data.Dataset.from_tensor_slices(shards).shuffle(len(shards), seed=seed)
+        dataset = files.interleave(
+            lambda path: tf.data.TFRecordDataset(path, buffer_size=SHARD_READ_BUFFER),
+            cycle_length=SHARD_CYCLE_LENGTH,
+            num_parallel_calls=AUTOTUNE,
+            deterministic=False
+        )
+        dataset = dataset.shuffle(SHUFFLE_BUFFER, seed=seed)
+    else:
+        # Sequential reads keep records aligned with labels
+        dataset = tf.data.TFRecordDataset(shards, buffer_size=SHARD_READ_BUFFER)
+    dataset = dataset.batch(batch_size).map(parse_batch, num_parallel_calls=AUTOTUNE)
+    
+    # TFRecordDataset has unknown cardinality; len() needs it
+    steps = math.ceil(len(labels) / batch_size)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(steps))
+    return dataset, class_indices, labels
+
+
+def tfrecords_match(data_dir, info, split):
+    """
+    True if the shards cover split and no class directory of any built split
+    changed since (same class folders, same mtimes)
+    """
+    if split not in info['splits']:
+        return False
+    for built_split, split_info in info['splits'].items():
+        split_dir = Path(data_dir) / built_split
+        if not split_dir.exists() or split_info.get('mtimes') != class_dir_mtimes(split_dir):
+            return False
+    return True
+
+
+def _load_split(data_dir, split, batch_size=32, shuffle=False, seed=42):
+    """
+    Use the TFRecord shards when built and still current, otherwise decode
+    from the directory
+    """
+    tfrecord_dir = Path(data_dir) / TFRECORD_SUBDIR
+    if (tfrecord_dir / TFRECORD_INFO).exists():
+        info = load_json(tfrecord_dir / TFRECORD_INFO)
+        if tfrecords_match(data_dir, info, split):
+            return load_tfrecord_dataset(
+                tfrecord_dir, split, batch_size=batch_size, shuffle=shuffle, seed=seed, info=info
+            )
+        print(f"  WARNING: TFRecord shards in {tfrecord_dir} do not match {split}/ "
+              f"(data changed since build_tfrecords.py); decoding from the directory")
+    return load_split_dataset(data_dir, split, batch_size=batch_size, shuffle=shuffle, seed=seed)
+
+
+def _attach_info(dataset, class_indices, labels):
+    """
+    Attach the metadata the rest of the script reads from a generator
+    """
+    dataset.class_indices = class_indices
+    dataset.labels = labels
+    dataset.samples = len(labels)
+    return dataset
+
+
 def create_train_generator(data_dir, batch_size=32, seed=42):
     """
-    Create training data generator with augmentation
+    Create training dataset with augmentation
     
-    Uses ImageDataGenerator with standard augmentations.
+    Augmentation runs as Keras preprocessing layers inside a parallel map.
     For differential augmentation, we use class weights during training.
     """
     print("\n Creating TRAINING generator...")
     
-    # Define augmentation
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        brightness_range=[0.8, 1.2],
-        fill_mode='nearest'
+    dataset, class_indices, labels = _load_split(
+        data_dir, 'train', batch_size=batch_size, shuffle=True, seed=seed
     )
     
-    # Create generator
-    train_generator = train_datagen.flow_from_directory(
-        directory=str(data_dir / 'train'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=batch_size,
-        class_mode='categorical',
-        shuffle=True,
-        seed=seed
-    )
+    # Define augmentation
+    augment = build_augmentation_layers(seed)
+    rescale = tf.keras.layers.Rescaling(1./255)
+    # Next free seed after the augmentation layers
+    brightness_seed = seed + len(augment.layers)
+    
+    train_generator = dataset.map(
+        lambda x, y: (rescale(_random_brightness(augment(x, training=True), brightness_seed)), y),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+    train_generator = _attach_info(train_generator, class_indices, labels)
     
     print(f" Training generator created")
     print(f"   Classes: {len(train_generator.class_indices)}")
@@ -97,26 +256,30 @@ def create_train_generator(data_dir, batch_size=32, seed=42):
     return train_generator
 
 
+def _create_eval_generator(data_dir, split, batch_size=32, seed=42):
+    """
+    Rescaled, unshuffled dataset without augmentation
+    """
+    dataset, class_indices, labels = _load_split(
+        data_dir, split, batch_size=batch_size, shuffle=False, seed=seed
+    )
+    rescale = tf.keras.layers.Rescaling(1./255)
+    
+    eval_generator = dataset.map(
+        lambda x, y: (rescale(x), y),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+    return _attach_info(eval_generator, class_indices, labels)
+
+
 def create_val_generator(data_dir, batch_size=32, seed=42):
     """
-    Create validation data generator (no augmentation)
+    Create validation dataset (no augmentation)
     """
     print("\n Creating VALIDATION generator...")
     
-    # No augmentation for validation
-    val_datagen = ImageDataGenerator(
-        rescale=1./255
-    )
-    
-    # Create generator
-    val_generator = val_datagen.flow_from_directory(
-        directory=str(data_dir / 'val'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=batch_size,
-        class_mode='categorical',
-        shuffle=False,  # Don't shuffle validation data
-        seed=seed
-    )
+    # No augmentation, don't shuffle validation data
+    val_generator = _create_eval_generator(data_dir, 'val', batch_size=batch_size, seed=seed)
     
     print(f" Validation generator created")
     print(f"   Classes: {len(val_generator.class_indices)}")
@@ -129,24 +292,12 @@ def create_val_generator(data_dir, batch_size=32, seed=42):
 
 def create_test_generator(data_dir, batch_size=32, seed=42):
     """
-    Create test data generator (no augmentation, no shuffle)
+    Create test dataset (no augmentation, no shuffle)
     """
     print("\n Creating TEST generator...")
     
-    # No augmentation for test
-    test_datagen = ImageDataGenerator(
-        rescale=1./255
-    )
-    
-    # Create generator
-    test_generator = test_datagen.flow_from_directory(
-        directory=str(data_dir / 'test'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=batch_size,
-        class_mode='categorical',
-        shuffle=False,  # NEVER shuffle test data
-        seed=seed
-    )
+    # No augmentation, NEVER shuffle test data
+    test_generator = _create_eval_generator(data_dir, 'test', batch_size=batch_size, seed=seed)
     
     print(f"   Test generator created")
     print(f"   Classes: {len(test_generator.class_indices)}")
@@ -172,7 +323,7 @@ def test_generators(train_gen, val_gen, test_gen):
     # Test training generator
     print("\n  Testing training generator...")
     try:
-        batch_x, batch_y = next(train_gen)
+        batch_x, batch_y = (t.numpy() for t in next(iter(train_gen)))
         print(f"    Batch shape: {batch_x.shape}")
         print(f"    Labels shape: {batch_y.shape}")
         print(f"    Pixel range: [{batch_x.min():.3f}, {batch_x.max():.3f}]")
@@ -184,7 +335,7 @@ def test_generators(train_gen, val_gen, test_gen):
     # Test validation generator
     print("\n  Testing validation generator...")
     try:
-        batch_x, batch_y = next(val_gen)
+        batch_x, batch_y = (t.numpy() for t in next(iter(val_gen)))
         print(f"    Batch shape: {batch_x.shape}")
         print(f"    Labels shape: {batch_y.shape}")
         print(f"    Pixel range: [{batch_x.min():.3f}, {batch_x.max():.3f}]")
@@ -195,7 +346,7 @@ def test_generators(train_gen, val_gen, test_gen):
     # Test test generator
     print("\n  Testing test generator...")
     try:
-        batch_x, batch_y = next(test_gen)
+        batch_x, batch_y = (t.numpy() for t in next(iter(test_gen)))
         print(f"    Batch shape: {batch_x.shape}")
         print(f"    Labels shape: {batch_y.shape}")
         print(f"    Pixel range: [{batch_x.min():.3f}, {batch_x.max():.3f}]")
@@ -233,13 +384,17 @@ def display_generator_info(train_gen, val_gen, test_gen, weights_data):
     print(f"{'Class Name':<15s} {'Index':>6s} {'Train':>8s} {'Val':>8s} {'Test':>8s}")
     print("-" * 70)
     
+    # Count samples per class, one histogram pass per generator
+    n_classes = len(class_indices)
+    train_hist = np.bincount(np.asarray(train_gen.labels, dtype=np.int64), minlength=n_classes)
+    val_hist = np.bincount(np.asarray(val_gen.labels, dtype=np.int64), minlength=n_classes)
+    test_hist = np.bincount(np.asarray(test_gen.labels, dtype=np.int64), minlength=n_classes)
+    
     for class_name in sorted(class_indices.keys()):
         idx = class_indices[class_name]
-        
-        # Count samples per class
-        train_count = sum(1 for y in train_gen.labels if y == idx)
-        val_count = sum(1 for y in val_gen.labels if y == idx)
-        test_count = sum(1 for y in test_gen.labels if y == idx)
+        train_count = int(train_hist[idx])
+        val_count = int(val_hist[idx])
+        test_count = int(test_hist[idx])
         
         print(f"{class_name:<15s} {idx:>6d} {train_count:>8d} {val_count:>8d} {test_count:>8d}")
     
@@ -251,9 +406,10 @@ def display_generator_info(train_gen, val_gen, test_gen, weights_data):
     recommended_weights = weights_data['recommended_weights']
     print(f"{'Index':>6s} {'Class Name':<15s} {'Weight':>10s}")
     print("-" * 70)
+    idx_to_class = {v: k for k, v in class_indices.items()}
     for idx_str, weight in sorted(recommended_weights.items(), key=lambda x: int(x[0])):
         idx = int(idx_str)
-        class_name = [k for k, v in class_indices.items() if v == idx][0]
+        class_name = idx_to_class[idx]
         print(f"{idx:>6d} {class_name:<15s} {weight:>10.4f}")
     
     # Summary statistics
@@ -283,20 +439,11 @@ def save_generator_config(train_gen, weights_data, output_dir):
         'class_weights': weights_data['recommended_weights'],
         'training_samples': train_gen.samples,
         'steps_per_epoch': len(train_gen),
-        'augmentation': {
-            'rotation_range': 20,
-            'width_shift_range': 0.2,
-            'height_shift_range': 0.2,
-            'shear_range': 0.2,
-            'zoom_range': 0.2,
-            'horizontal_flip': True,
-            'brightness_range': [0.8, 1.2]
-        }
+        'augmentation': AUGMENTATION
     }
     
     output_path = output_dir / 'generator_config.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2)
+    dump_json(config, output_path)
     
     print(f"\n Generator config saved to: {output_path}")
 
@@ -342,7 +489,7 @@ def main():
     print("\n Usage in training script:")
     print("""
     import json
-    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from data_generators import create_train_generator, create_val_generator
     
     # Load class weights
     with open('data/processed/class_weights_simple.json') as f:
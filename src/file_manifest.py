@@ -0,0 +1,123 @@
+"""
+FILE MANIFEST
+=============
+Per-class image counts of the processed dataset, written once by
+merge_classes.py so later steps do not have to walk every class directory
+again. The manifest records the mtime of each class directory; adding or
+removing a file changes it, which marks the manifest as stale.
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MANIFEST_NAME = 'file_manifest.json'
+
+# Image suffixes counted per class (matched case-insensitively)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Directory listing is syscall bound and releases the GIL
+MAX_SCAN_WORKERS = 32
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def count_images(class_dir):
+    """
+    Count image files in a class directory with a single scandir pass
+    """
+    n_images = 0
+    with os.scandir(class_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                n_images += 1
+    return n_images
+
+
+def list_images(class_dir):
+    """
+    List image files in a class directory with a single scandir pass
+    """
+    with os.scandir(class_dir) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+        ]
+
+
+def count_images_per_dir(class_dirs):
+    """
+    Count images in several class directories concurrently, in input order
+    """
+    if not class_dirs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_SCAN_WORKERS, len(class_dirs))) as executor:
+        return list(executor.map(count_images, class_dirs))
+
+
+def class_dir_mtimes(split_dir):
+    """
+    Map class name -> directory mtime (ns) for the non-hidden class folders
+    """
+    with os.scandir(split_dir) as entries:
+        return {
+            entry.name: entry.stat().st_mtime_ns for entry in entries
+            if entry.is_dir() and not entry.name.startswith('.')
+        }
+
+
+def build_manifest(root, splits=('train', 'val', 'test')):
+    """
+    Walk each split once and collect image counts and class directory mtimes
+    """
+    manifest = {}
+    for split in splits:
+        split_dir = Path(root) / split
+        if not split_dir.exists():
+            continue
+        mtimes = class_dir_mtimes(split_dir)
+        class_names = sorted(mtimes)
+        counts = count_images_per_dir([split_dir / name for name in class_names])
+        manifest[split] = {
+            'counts': dict(zip(class_names, counts)),
+            'mtimes': mtimes
+        }
+    return manifest
+
+
+def save_manifest(root, splits=('train', 'val', 'test')):
+    """
+    Build the manifest for root and write it next to the splits
+    """
+    manifest = build_manifest(root, splits)
+    output_path = Path(root) / MANIFEST_NAME
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return output_path
+
+
+def load_split_counts(root, split='train'):
+    """
+    Return {class_name: count} for a split from the manifest
+
+    Returns None when the manifest is missing, does not cover the split,
+    or any class directory changed since it was written.
+    """
+    manifest_path = Path(root) / MANIFEST_NAME
+    split_dir = Path(root) / split
+    if not manifest_path.exists() or not split_dir.exists():
+        return None
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entry = json.load(f).get(split)
+
+    # One stat per class directory instead of one per file
+    if entry is None or entry['mtimes'] != class_dir_mtimes(split_dir):
+        return None
+    return entry['counts']
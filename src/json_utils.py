@@ -0,0 +1,64 @@
+"""
+JSON HELPERS
+============
+Read and write the pipeline's config/metadata JSON files with orjson when
+it is installed (C parser/serializer), otherwise with the standard library.
+Both write 2-space indented UTF-8 JSON that parses to the same objects, but
+the text is not byte-identical: some floats are formatted differently
+(orjson writes 1e-05 as 0.00001). Int keys and NumPy scalars/arrays are
+accepted on both paths (natively by orjson, via _to_builtin for json).
+"""
+
+import json
+import numpy as np
+
+# orjson (optional): faster loads/dumps, no intermediate str
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json(path):
+    """
+    Parse a UTF-8 JSON file
+    """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _to_builtin(obj):
+    """
+    json.dump default= hook: NumPy scalars and arrays to Python types
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(obj, path, indent=True):
+    """
+    Write obj to path as UTF-8 JSON
+    
+    indent=False writes compact JSON, for machine-only files with long
+    lists (e.g. per-image labels) that would otherwise take a line per item
+    """
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=options))
+        return
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        if indent:
+            json.dump(obj, f, indent=2, ensure_ascii=False, default=_to_builtin)
+        else:
+            json.dump(obj, f, separators=(',', ':'), ensure_ascii=False, default=_to_builtin)
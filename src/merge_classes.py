@@ -15,6 +15,8 @@ from pathlib import Path
 from tqdm import tqdm
 import json
 
+from file_manifest import list_images, save_manifest
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -107,10 +109,8 @@ def copy_and_merge_images(source_dir, target_dir, merge_mapping):
             source_class_dir = source_split / original_class
             target_class_dir = target_split / target_class
             
-            # Find all images
-            images = []
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']:
-                images.extend(list(source_class_dir.glob(ext)))
+            # Find all images (one directory pass, suffix matched case-insensitively)
+            images = list_images(source_class_dir)
             
             # Copy images
             for img_path in images:
@@ -219,6 +219,10 @@ def save_merge_info(target_dir, merge_mapping, stats, class_totals):
         json.dump(metadata, f, indent=2, ensure_ascii=False)
     
     print(f"\n Merge information saved to: {output_path}")
+    
+    # Per-class file counts for later steps (see file_manifest.py)
+    manifest_path = save_manifest(target_dir)
+    print(f" File manifest saved to: {manifest_path}")
 
 
 # ============================================================================